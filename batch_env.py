@@ -0,0 +1,148 @@
+import numpy as np
+from setting import ROWS, INITIAL_SNAKE_LENGTH
+from board import get_board
+
+# Per action in env.ACTIONS order (left, right, up, down): x step, y step and the reverse action
+DX = np.array([-1, 1, 0, 0])
+DY = np.array([0, 0, -1, 1])
+OPPOSITE = np.array([1, 0, 3, 2])
+
+class BatchSnakeEnv:
+    # N games stepped in lockstep with NumPy, following Snake.step: the
+    # tail leaves before the head arrives, a full board wins before
+    # collisions are checked, then walls and the body, then the move limit,
+    # then eating, where the tail grows back into the cell it just left
+    # before the new apple is placed. Finished games restart on the same call.
+    #
+    # Each body is a ring buffer of flat cells (x * rows + y) with the head
+    # at head_slot and the tail length - 1 slots behind it, so a move writes
+    # one slot. Observations are (N, 3, rows, rows) uint8 planes (body, head,
+    # apple) like env.SnakeEnv, updated in place.
+    reward_apple = 1.0
+    reward_death = -1.0
+    reward_step = 0.0
+
+    def __init__(self, n, rows=ROWS, seed=None):
+        board = get_board(rows)
+        self.n = n
+        self.rows = rows
+        self.cells = board.cells
+        self.max_length = board.snake_max_length
+        self.max_moves_without_eating = board.max_moves_without_eating
+        self.rng = np.random.default_rng(seed)
+        self.games = np.arange(n)
+
+        self.body = np.zeros((n, self.cells), dtype=np.int32)
+        self.head_slot = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.occupied = np.zeros((n, self.cells), dtype=np.uint8)
+        self.apple = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.moves = np.zeros(n, dtype=np.int64)
+        self.moves_without_eating = np.zeros(n, dtype=np.int64)
+
+        self.planes = np.zeros((n, 3, self.cells), dtype=np.uint8)
+        self.observation = self.planes.reshape(n, 3, rows, rows)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.dones = np.zeros(n, dtype=bool)
+        # Score and result of the games that finished on the last step,
+        # read them before the next step
+        self.final_score = np.zeros(n, dtype=np.int64)
+        self.won = np.zeros(n, dtype=bool)
+
+        # Snake starts with its head in the middle of the board facing left
+        middle = rows // 2
+        start = [(middle + i) * rows + middle for i in range(INITIAL_SNAKE_LENGTH)]
+        self.start_cells = np.array(start[::-1], dtype=np.int32)
+
+    def reset(self):
+        self.reset_games(self.games)
+        return self.observation
+
+    def reset_games(self, games):
+        length = len(self.start_cells)
+        self.body[games, :length] = self.start_cells
+        self.head_slot[games] = length - 1
+        self.length[games] = length
+        self.direction[games] = 0
+        self.occupied[games] = 0
+        self.occupied[games[:, None], self.start_cells] = 1
+        self.score[games] = 0
+        self.moves[games] = 0
+        self.moves_without_eating[games] = 0
+        self.place_apples(games)
+
+        self.planes[games] = 0
+        self.planes[games[:, None], 0, self.start_cells] = 1
+        self.planes[games, 1, self.start_cells[-1]] = 1
+        self.planes[games, 2, self.apple[games]] = 1
+
+    def place_apples(self, games):
+        # A uniformly random free cell per game, a full board keeps its apple
+        keys = self.rng.random((len(games), self.cells))
+        keys[self.occupied[games] > 0] = -1
+        choice = keys.argmax(axis=1)
+        has_room = keys[np.arange(len(games)), choice] >= 0
+        self.apple[games[has_room]] = choice[has_room]
+
+    def step(self, actions):
+        rows, cells = self.rows, self.cells
+        games = self.games
+        occupied = self.occupied
+        planes = self.planes
+
+        actions = np.asarray(actions)
+        turn = actions != OPPOSITE[self.direction]
+        self.direction[turn] = actions[turn]
+
+        head = self.body[games, self.head_slot]
+        tail_slot = (self.head_slot - self.length + 1) % cells
+        tail = self.body[games, tail_slot]
+        occupied[games, tail] -= 1
+        planes[games, 0, tail] = occupied[games, tail] > 0
+        planes[games, 1, head] = 0
+
+        x = head // rows + DX[self.direction]
+        y = head % rows + DY[self.direction]
+        wall = (x < 0) | (x >= rows) | (y < 0) | (y >= rows)
+        inside = ~wall
+        new_head = np.where(inside, x * rows + y, 0)
+        self.head_slot = (self.head_slot + 1) % cells
+        self.body[games, self.head_slot] = new_head
+        occupied[games[inside], new_head[inside]] += 1
+        planes[games[inside], 0, new_head[inside]] = 1
+        planes[games[inside], 1, new_head[inside]] = 1
+        self.moves += 1
+        self.moves_without_eating += 1
+
+        won = self.score == self.max_length
+        dead = ~won & (wall | (occupied[games, new_head] > 1))
+        timeout = ~won & ~dead & (self.moves_without_eating > self.max_moves_without_eating)
+        done = won | dead | timeout
+        eat = ~done & (new_head == self.apple)
+
+        rewards = self.rewards
+        rewards.fill(self.reward_step)
+        rewards[eat | won] = self.reward_apple
+        rewards[dead | timeout] = self.reward_death
+
+        eaters = games[eat]
+        if len(eaters):
+            self.moves_without_eating[eaters] = 0
+            self.score[eaters] += 1
+            self.length[eaters] += 1
+            grown = tail[eat]
+            occupied[eaters, grown] += 1
+            planes[eaters, 0, grown] = 1
+            planes[eaters, 2, self.apple[eaters]] = 0
+            self.place_apples(eaters)
+            planes[eaters, 2, self.apple[eaters]] = 1
+
+        self.dones[:] = done
+        self.won[:] = won
+        self.final_score[:] = self.score
+        finished = games[done]
+        if len(finished):
+            self.reset_games(finished)
+        return self.observation, rewards, self.dones
@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from collections import deque
+from random import Random
+from setting import *
+from setting import GRID, ADJACENCY_DICT
+from snake import Snake
+from board import get_board, MIN_ROWS
+from headless import play_game
+from search import BFS, AStar
+
+def zigzag(rows):
+    # Columns over all but the bottom row, starting at the bottom of the first
+    # column so the tail always borders the free part of the board
+    cells = []
+    for x in range(rows):
+        ys = range(rows - 2, -1, -1) if x % 2 == 0 else range(rows - 1)
+        cells.extend([x, y] for y in ys)
+    return cells
+
+def make_snake(length, seed=0, rows=ROWS):
+    # Lay a body of the given length along the zigzag, head last, heading on
+    # the way the zigzag last went
+    board = get_board(rows)
+    snake = Snake(None, True, Random(seed), board=board)
+    cells = zigzag(rows)[:length][::-1]
+
+    snake.clear_cells()
+    snake.body = deque(x * rows + y for x, y in cells)
+    for pos in cells:
+        snake.occupy(pos)
+    snake.restamp()
+
+    snake.head.pos = tuple(cells[0])
+    snake.dir = snake.head.dir = (cells[0][0] - cells[1][0], cells[0][1] - cells[1][1])
+    snake.apple.pos = (rows - 1, rows - 1)
+    return snake
+
+def legacy_is_position_free(squares, position):
+    if position[0] >= ROWS or position[0] < 0 or position[1] >= ROWS or position[1] < 0:
+        return False
+    for sqr in squares:
+        if sqr.pos == position:
+            return False
+    return True
+
+def legacy_hitting_self(squares):
+    for sqr in squares[1:]:
+        if sqr.pos == squares[0].pos:
+            return True
+
+def legacy_bfs(snake, s, e):
+    q = [s]
+    visited = {tuple(pos): False for pos in GRID}
+    visited[s] = True
+    prev = {tuple(pos): None for pos in GRID}
+
+    while q:
+        node = q.pop(0)
+        for next_node in ADJACENCY_DICT[node]:
+            if snake.is_position_free(next_node) and not visited[tuple(next_node)]:
+                q.append(tuple(next_node))
+                visited[tuple(next_node)] = True
+                prev[tuple(next_node)] = node
+
+    path = []
+    p_node = e
+    while True:
+        if prev[p_node] is None:
+            return []
+        p_node = prev[p_node]
+        if p_node == s:
+            path.append(e)
+            return path
+        path.insert(0, p_node)
+
+def measure(func, repeat=5):
+    number, _ = timeit.Timer(func).autorange()
+    best = min(timeit.Timer(func).repeat(repeat, number))
+    return best / number
+
+def bench_occupancy(lengths):
+    print(f"{'length':>8} {'check':>16} {'scan (us)':>12} {'grid (us)':>12} {'speedup':>9}")
+    for length in lengths:
+        snake = make_snake(length)
+        squares = snake.squares
+        cells = [tuple(pos) for pos in GRID]
+        checks = {
+            'is_position_free': (lambda: [legacy_is_position_free(squares, pos) for pos in cells],
+                                 lambda: [snake.is_position_free(pos) for pos in cells]),
+            'hitting_self': (lambda: legacy_hitting_self(squares),
+                             lambda: snake.hitting_self())
+        }
+        for name, (legacy, current) in checks.items():
+            scale = len(cells) if name == 'is_position_free' else 1
+            before = measure(legacy) / scale * 1e6
+            after = measure(current) / scale * 1e6
+            print(f"{length:>8} {name:>16} {before:>12.3f} {after:>12.3f} {before / after:>8.1f}x")
+
+def bench_bfs(lengths):
+    print(f"{'length':>8} {'goal':>10} {'legacy (us)':>12} {'engine (us)':>12} {'speedup':>9}")
+    for length in lengths:
+        snake = make_snake(length)
+        head = tuple(snake.head.pos)
+        goals = {'apple': tuple(snake.apple.pos), 'near': None}
+        for n in ADJACENCY_DICT[head]:
+            if snake.is_position_free(n):
+                goals['near'] = tuple(n)
+        for name, goal in goals.items():
+            if goal is None:
+                continue
+            assert snake.bfs(head, goal) == legacy_bfs(snake, head, goal)
+            before = measure(lambda: legacy_bfs(snake, head, goal)) * 1e6
+            after = measure(lambda: snake.bfs(head, goal)) * 1e6
+            print(f"{length:>8} {name:>10} {before:>12.1f} {after:>12.1f} {before / after:>8.1f}x")
+
+def bench_backends(sizes):
+    try:
+        from flood import FloodFill
+    except ImportError:
+        print("numpy is not installed, skipping the search backend comparison")
+        return
+
+    print(f"{'rows':>8} {'board':>10} {'bfs (us)':>12} {'numpy (us)':>12} {'speedup':>9}")
+    for rows in sizes:
+        neighbors = build_neighbor_cells(rows)
+        bfs, flood = BFS(neighbors), FloodFill(neighbors, rows)
+        boards = {'open': bytearray(rows * rows), 'corridors': bytearray(rows * rows)}
+        # Walls every fourth column with a gap at alternating ends
+        for x in range(2, rows - 1, 4):
+            gap = 0 if x % 8 == 2 else rows - 1
+            for y in range(rows):
+                if y != gap:
+                    boards['corridors'][x * rows + y] = 1
+
+        start, goal = 0, rows * rows - 1
+        for name, blocked in boards.items():
+            assert len(bfs.search(blocked, start, goal)) == len(flood.search(blocked, start, goal))
+            before = measure(lambda: bfs.search(blocked, start, goal), repeat=3) * 1e6
+            after = measure(lambda: flood.search(blocked, start, goal), repeat=3) * 1e6
+            print(f"{rows:>8} {name:>10} {before:>12.1f} {after:>12.1f} {before / after:>8.2f}x")
+
+def measure_moves(length, moves, repeat):
+    # move() changes the snake, so every round starts from a fresh one
+    best = None
+    for _ in range(repeat):
+        snake = make_snake(length)
+        start = time.perf_counter()
+        for _ in range(moves):
+            snake.move()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / moves
+
+def lookahead_check(snake):
+    with snake.lookahead() as v_snake:
+        v_snake.move(snake.get_available_neighbors(snake.head.pos)[0])
+        return v_snake.reaches_tail()
+
+def run_micro(lengths, repeat):
+    # Seconds per call for the engine hot spots at several snake lengths
+    results = {}
+    for length in lengths:
+        snake = make_snake(length)
+        head, apple = tuple(snake.head.pos), tuple(snake.apple.pos)
+        cells = [list(pos) for pos in GRID]
+        cases = {
+            'bfs': lambda: snake.bfs(head, apple),
+            'is_position_free': lambda: [snake.is_position_free(pos) for pos in cells],
+            'create_virtual_snake': snake.create_virtual_snake,
+            'lookahead': lambda: lookahead_check(snake),
+            'set_path': snake.set_path,
+            'generate_apple': snake.generate_apple
+        }
+        for name, func in cases.items():
+            seconds = measure(func, repeat)
+            if name == 'is_position_free':
+                seconds /= len(cells)
+            results[f'micro.{name}.len{length}'] = seconds
+        results[f'micro.move.len{length}'] = measure_moves(length, 200, repeat)
+    return results
+
+def run_apple_search(sizes, repeat, decisions=20):
+    # Seconds per apple search of BFS and A* on mid-game boards, from the
+    # head to apples drawn like the game draws them. Nodes expanded per
+    # search are printed alongside, they are what A* saves.
+    results = {}
+    print(f"{'rows':>8} {'bfs nodes':>10} {'astar nodes':>12} {'bfs (us)':>10} {'astar (us)':>11}")
+    for rows in sizes:
+        snake = make_snake(rows * rows // 4, rows=rows)
+        neighbors = get_board(rows).neighbor_cells
+        finders = {'bfs': BFS(neighbors), 'astar': AStar(neighbors, rows)}
+        head = snake.head.pos[0] * rows + snake.head.pos[1]
+        rng = Random(rows)
+        goals = [rng.choice(snake.free_cells) for _ in range(decisions)]
+        nodes = {}
+        for name, finder in finders.items():
+            nodes[name] = 0
+            for goal in goals:
+                nodes[name] += finder.expanded(bool(finder.search(snake.occupied, head, goal)))
+            search_all = lambda: [finder.search(snake.occupied, head, goal) for goal in goals]
+            results[f'micro.apple_{name}.rows{rows}'] = measure(search_all, repeat) / decisions
+        print(f"{rows:>8} {nodes['bfs'] / decisions:>10.0f} {nodes['astar'] / decisions:>12.0f} "
+              f"{results[f'micro.apple_bfs.rows{rows}'] * 1e6:>10.1f} "
+              f"{results[f'micro.apple_astar.rows{rows}'] * 1e6:>11.1f}")
+    return results
+
+def run_macro(sizes, games, max_moves):
+    # Seconds per move of whole seeded AI games, capped so large boards finish
+    results = {}
+    for rows in sizes:
+        moves = 0
+        start = time.perf_counter()
+        for seed in range(games):
+            moves += play_game(seed, rows=rows, max_moves=max_moves)['moves']
+        results[f'macro.game.rows{rows}'] = (time.perf_counter() - start) / moves
+    return results
+
+STARTUP_MODULES = ['snake', 'headless', 'tournament', 'env', 'play']
+
+def run_startup(repeat):
+    # Seconds a fresh interpreter spends importing each entry point, over a
+    # bare interpreter start, which is what every pool worker pays. Also
+    # prints whether the import pulled in pygame.
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def launch(code):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            done = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        # pygame greets on stdout, the answer is the last word
+        words = done.stdout.split()
+        return best, words[-1] if words else ''
+
+    bare, _ = launch('pass')
+    results = {}
+    print(f"{'module':>12} {'import (ms)':>12} {'pygame':>8}")
+    for module in STARTUP_MODULES:
+        seconds, pygame = launch(f"import sys, {module}; print('pygame' in sys.modules)")
+        results[f'startup.import.{module}'] = max(0.0, seconds - bare)
+        print(f"{module:>12} {(seconds - bare) * 1e3:>12.1f} {pygame:>8}")
+    return results
+
+def print_results(results):
+    for name, seconds in results.items():
+        print(f"{name:<36} {seconds * 1e6:>12.2f} us")
+
+def compare(baseline, results, threshold):
+    # Returns the benchmarks that got slower than the baseline by more than
+    # the threshold, printing every benchmark the two runs share
+    regressions = []
+    print(f"{'benchmark':<36} {'baseline (us)':>14} {'current (us)':>14} {'change':>9}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36} {baseline[name] * 1e6:>14.2f} {seconds * 1e6:>14.2f} {change * 100:>8.1f}%{flag}")
+    return regressions
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the snake engine")
+    parser.add_argument('--suite', choices=['micro', 'macro', 'startup', 'all', 'legacy'], default='all',
+                        help="legacy prints the before/after comparisons of earlier optimizations")
+    parser.add_argument('--lengths', type=int, nargs='+', default=[3, 50, 150, 250],
+                        help="snake lengths for the micro benchmarks")
+    parser.add_argument('--rows', type=int, nargs='+', default=[17, 32, 64],
+                        help="board sizes for the macro benchmarks")
+    parser.add_argument('--games', type=int, default=2, help="seeded games per board size")
+    parser.add_argument('--max-moves', type=int, default=3000, help="move limit per macro game")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[17, 64, 128],
+                        help="board sizes for the search backend and apple search comparisons")
+    parser.add_argument('--repeat', type=int, default=5, help="timing rounds, the best one counts")
+    parser.add_argument('--output', default='bench_results.json', help="where to write the results")
+    parser.add_argument('--compare', metavar='BASELINE', help="results file to check for regressions")
+    parser.add_argument('--against', metavar='RESULTS',
+                        help="compare this results file instead of running the benchmarks")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown that counts as a regression, 0.10 is 10%%")
+    args = parser.parse_args(argv)
+    too_small = [rows for rows in args.rows + args.sizes if rows < MIN_ROWS]
+    if too_small:
+        parser.error(f"boards need at least {MIN_ROWS} rows, got {too_small[0]}")
+
+    if args.suite == 'legacy':
+        bench_occupancy(args.lengths)
+        print()
+        bench_bfs(args.lengths)
+        print()
+        bench_backends(args.sizes)
+        return
+
+    if args.against:
+        results = load_results(args.against)
+    else:
+        results = {}
+        if args.suite in ('micro', 'all'):
+            results.update(run_micro(args.lengths, args.repeat))
+            results.update(run_apple_search(args.sizes, args.repeat))
+        if args.suite in ('macro', 'all'):
+            results.update(run_macro(args.rows, args.games, args.max_moves))
+        if args.suite in ('startup', 'all'):
+            results.update(run_startup(args.repeat))
+        print_results(results)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'results': results
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        print()
+        regressions = compare(load_results(args.compare), results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%")
+            sys.exit(1)
+        print("No regressions")
+
+if __name__ == '__main__':
+    main()
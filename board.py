@@ -0,0 +1,41 @@
+from setting import *
+from search import make_path_finder
+
+# The starting snake runs from the middle of the board towards the right edge
+MIN_ROWS = 2 * INITIAL_SNAKE_LENGTH - 1
+# The largest board that can be drawn: sprites are inset GAP_SIZE from each
+# side of a square, so a square needs at least one pixel left between them
+MAX_DRAWN_ROWS = WIDTH // (2 * GAP_SIZE + 1)
+
+class Board:
+    # Everything that depends on the board size, so games on boards of
+    # different sizes can run side by side in one process
+    def __init__(self, rows=ROWS):
+        if rows < MIN_ROWS:
+            raise ValueError(f"A board needs at least {MIN_ROWS} rows for the starting snake, got {rows}")
+        self.rows = rows
+        self.cells = rows * rows
+        self.square_size = WIDTH // rows
+        self.max_moves_without_eating = rows * rows * rows * 2
+        self.snake_max_length = rows * rows - INITIAL_SNAKE_LENGTH
+        self.neighbor_cells = build_neighbor_cells(rows)
+        self.adjacency = {(cell // rows, cell % rows): [(n // rows, n % rows) for n in neighbors]
+                          for cell, neighbors in enumerate(self.neighbor_cells)}
+        self.path_finders = {}
+
+    def get_neighbors(self, position):
+        return self.adjacency[position[0], position[1]]
+
+    def path_finder(self, backend='python'):
+        # Searches never overlap, so every snake on this board shares one set
+        # of buffers per backend
+        if backend not in self.path_finders:
+            self.path_finders[backend] = make_path_finder(backend, self.neighbor_cells, self.rows)
+        return self.path_finders[backend]
+
+BOARDS = {}
+
+def get_board(rows=ROWS):
+    if rows not in BOARDS:
+        BOARDS[rows] = Board(rows)
+    return BOARDS[rows]
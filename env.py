@@ -0,0 +1,81 @@
+import numpy as np
+from random import Random
+from setting import ROWS
+from snake import Snake
+from board import get_board
+
+ACTIONS = ['left', 'right', 'up', 'down']
+
+class SnakeEnv:
+    # Gym-style wrapper around the Snake rules for training policies:
+    # reset(seed) starts a game, step(action) plays one move. Observations
+    # are one preallocated uint8 array of planes (body, head, apple), indexed
+    # [plane, x, y] and updated in place from the cells a move changed, so
+    # callers must copy it if they keep it past the next step. Writes go
+    # through a flat memoryview, where plane p of cell x * rows + y sits at
+    # p * cells + cell, since single-item numpy writes are slow. An action
+    # that reverses the snake is ignored and it keeps going straight.
+    reward_apple = 1.0
+    reward_death = -1.0
+    reward_step = 0.0
+
+    def __init__(self, rows=ROWS):
+        self.board = get_board(rows)
+        self.rows = rows
+        self.cells = rows * rows
+        self.observation = np.zeros((3, rows, rows), dtype=np.uint8)
+        self.planes = memoryview(self.observation).cast('B')
+        self.observation_shape = self.observation.shape
+        self.n_actions = len(ACTIONS)
+        self.info = {'result': 'playing', 'score': 0, 'moves': 0}
+        self.snake = None
+
+    def reset(self, seed=None):
+        self.snake = Snake(None, False, Random(seed), board=self.board)
+        self.snake.dirty = set()
+        obs = self.observation
+        obs.fill(0)
+        for cell in self.snake.body:
+            self.planes[cell] = 1
+        obs[1, self.snake.head.pos[0], self.snake.head.pos[1]] = 1
+        obs[2, self.snake.apple.pos[0], self.snake.apple.pos[1]] = 1
+        self.info['result'] = 'playing'
+        self.info['score'] = 0
+        self.info['moves'] = 0
+        return obs
+
+    def step(self, action):
+        snake = self.snake
+        planes = self.planes
+        rows = self.rows
+        cells = self.cells
+        head = snake.head.pos[0] * rows + snake.head.pos[1]
+        apple = snake.apple.pos[0] * rows + snake.apple.pos[1]
+        score = snake.score
+
+        snake.set_direction(ACTIONS[action])
+        result = snake.step()
+
+        occupied = snake.occupied
+        for x, y in snake.dirty:
+            if 0 <= x < rows and 0 <= y < rows:
+                planes[x * rows + y] = occupied[x * rows + y] > 0
+        snake.dirty.clear()
+        planes[cells + head] = 0
+        x, y = snake.head.pos
+        if 0 <= x < rows and 0 <= y < rows:
+            planes[cells + x * rows + y] = 1
+        planes[2 * cells + apple] = 0
+        planes[2 * cells + snake.apple.pos[0] * rows + snake.apple.pos[1]] = 1
+
+        if result == 'dead' or result == 'timeout':
+            reward = self.reward_death
+        elif snake.score > score or result == 'win':
+            reward = self.reward_apple
+        else:
+            reward = self.reward_step
+
+        self.info['result'] = result
+        self.info['score'] = snake.score
+        self.info['moves'] = snake.total_moves
+        return self.observation, reward, result != 'playing', self.info
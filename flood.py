@@ -0,0 +1,75 @@
+import numpy as np
+
+class FloodFill:
+    # Breadth-first search as a wavefront: each step gathers the neighbors of
+    # the whole frontier from a neighbor table and filters them with the
+    # occupancy array in a few vectorized operations, so the Python loop runs
+    # once per distance instead of once per cell. That pays off on large open
+    # boards of about 128 rows and up; below that, and on long one-cell
+    # corridors, search.BFS is faster. Has the same search() and reachable()
+    # interface as search.BFS, but among equally short paths it may pick a
+    # different one.
+    def __init__(self, neighbors, rows):
+        self.neighbors = neighbors
+        self.rows = rows
+        cells = rows * rows
+        self.cells = cells
+        # Neighbor table padded with a sentinel cell that is never open
+        self.table = np.full((cells, 4), cells, dtype=np.intp)
+        for cell, cell_neighbors in enumerate(neighbors):
+            self.table[cell, :len(cell_neighbors)] = cell_neighbors
+        self.open = np.zeros(cells + 1, dtype=bool)
+        self.dist = np.empty(cells + 1, dtype=np.int32)
+        self.owner = np.empty(cells + 1, dtype=np.intp)
+        self.order = np.arange(4 * cells, dtype=np.intp)
+
+    def distance_field(self, blocked, start, goal=-1):
+        cells = self.cells
+        occupied = np.frombuffer(blocked, dtype=np.uint8, count=cells)
+        is_open, dist, owner, order, table = self.open, self.dist, self.owner, self.order, self.table
+        np.equal(occupied, 0, out=is_open[:cells])
+        is_open[start] = False
+        dist.fill(-1)
+        dist[start] = 0
+
+        frontier = np.array([start], dtype=np.intp)
+        distance = 0
+        while frontier.size:
+            distance += 1
+            candidates = table[frontier].ravel()
+            candidates = candidates[is_open[candidates]]
+            if not candidates.size:
+                break
+            # Keep one copy of cells reached from several frontier cells
+            index = order[:candidates.size]
+            owner[candidates] = index
+            frontier = candidates[owner[candidates] == index]
+            is_open[frontier] = False
+            dist[frontier] = distance
+            if goal >= 0 and dist[goal] >= 0:
+                break
+        return dist[:cells]
+
+    def search(self, blocked, start, goal):
+        dist = self.distance_field(blocked, start, goal)
+        steps = int(dist[goal])
+        if steps <= 0:
+            return []
+
+        path = [goal]
+        node = goal
+        for d in range(steps - 1, 0, -1):
+            for next_node in self.neighbors[node]:
+                if dist[next_node] == d:
+                    node = next_node
+                    break
+            path.append(node)
+        path.reverse()
+        return path
+
+    def expanded(self, found):
+        return int(np.count_nonzero(self.dist[:self.cells] >= 0))
+
+    def reachable(self, blocked, start, goal):
+        # Stops at the goal like search() but skips walking the path back
+        return self.distance_field(blocked, start, goal)[goal] > 0
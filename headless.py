@@ -0,0 +1,102 @@
+import argparse
+import time
+from random import Random
+from setting import ROWS
+from snake import Snake
+from board import get_board, MIN_ROWS
+from profiler import PlannerProfiler, PHASES
+from planners import PLANNERS, planner_error
+
+def play_game(seed=None, backend='python', rows=ROWS, max_moves=None, profiler=None, planner='bfs'):
+    snake = Snake(None, True, Random(seed), backend, get_board(rows), planner)
+    snake.profiler = profiler
+    start = time.perf_counter()
+
+    result = 'playing'
+    while result == 'playing':
+        result = snake.step()
+        if max_moves is not None and snake.total_moves >= max_moves:
+            break
+
+    return {
+        'seed': seed,
+        'rows': rows,
+        'result': result,
+        'score': snake.score,
+        'won': snake.won_game,
+        'moves': snake.total_moves,
+        'moves_per_apple': snake.moves_per_apple,
+        'replans': snake.plan_stats['replans'],
+        'reused_plans': snake.plan_stats['reused'],
+        'wall_time': time.perf_counter() - start
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run AI snake games without a window")
+    parser.add_argument('--games', type=int, default=100, help="number of games to play")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, game i uses seed + i")
+    parser.add_argument('--rows', type=int, default=ROWS, help="board size")
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python',
+                        help="search backend used by the AI; numpy is slower than python "
+                             "below about 128 rows")
+    parser.add_argument('--planner', choices=PLANNERS, default='bfs',
+                        help="AI strategy; timed plans about three times slower than bfs and times out "
+                             "more often on small boards, "
+                             "hamiltonian needs an even number of rows")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="profile the planner and write a per-tick trace as JSON lines")
+    parser.add_argument('--verbose', action='store_true', help="print a line per game")
+    args = parser.parse_args(argv)
+    if args.rows < MIN_ROWS:
+        parser.error(f"the board needs at least {MIN_ROWS} rows, got {args.rows}")
+    error = planner_error(args.planner, args.rows)
+    if error:
+        parser.error(error)
+
+    wins = 0
+    total_score = 0
+    total_moves = 0
+    replans = 0
+    reused = 0
+    # Ticks go straight to the trace file, none are held in memory
+    profiler = PlannerProfiler(trace_limit=0, trace_path=args.trace) if args.trace else None
+    start = time.perf_counter()
+
+    for i in range(args.games):
+        game = play_game(args.seed + i, args.backend, args.rows, profiler=profiler, planner=args.planner)
+        wins += game['won']
+        total_score += game['score']
+        total_moves += game['moves']
+        replans += game['replans']
+        reused += game['reused_plans']
+        if args.verbose:
+            print(f"seed {game['seed']}: {game['result']} score={game['score']} "
+                  f"moves={game['moves']} time={game['wall_time']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    games = max(1, args.games)
+    print(f"Games: {args.games}  Wins: {wins} ({wins / games * 100:.1f}%)")
+    print(f"Average score: {total_score / games:.1f}  Average moves: {total_moves / games:.1f}")
+    print(f"Plans reused: {reused} of {reused + replans} ticks ({reused / max(1, reused + replans) * 100:.1f}%)")
+    print(f"Elapsed: {elapsed:.2f}s  ({args.games / max(elapsed, 1e-9):.1f} games/s, "
+          f"{total_moves / max(elapsed, 1e-9):.0f} moves/s)")
+
+    if profiler is not None:
+        print_profile(profiler)
+        profiler.close()
+        print(f"Trace written to {args.trace}")
+
+def print_profile(profiler):
+    totals = profiler.totals
+    ticks = max(1, totals['ticks'])
+    print(f"Planning: {profiler.mean_plan_time() * 1e6:.1f} us/tick  "
+          f"BFS calls: {totals['bfs_calls'] / ticks:.2f}/tick  "
+          f"Nodes expanded: {totals['nodes_expanded'] / ticks:.1f}/tick  "
+          f"Lookaheads: {totals['lookaheads'] / ticks:.2f}/tick")
+    for phase in PHASES:
+        print(f"  {phase:<14} {totals['phases'][phase] / max(totals['plan_time'], 1e-9) * 100:5.1f}% of planning time")
+    for branch, count in sorted(profiler.branches.items(), key=lambda item: -item[1]):
+        print(f"  {branch:<14} {count / ticks * 100:5.1f}% of ticks")
+
+if __name__ == '__main__':
+    main()
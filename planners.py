@@ -0,0 +1,117 @@
+PLANNERS = ['bfs', 'astar', 'timed', 'hamiltonian']
+
+def make_planner(name, board):
+    if name == 'bfs':
+        return BFSPlanner()
+    if name == 'astar':
+        return BFSPlanner('astar')
+    if name == 'timed':
+        return BFSPlanner(timed=True)
+    if name == 'hamiltonian':
+        return HamiltonianPlanner(board)
+    raise ValueError(f"Unknown planner: {name}")
+
+def planner_error(name, rows):
+    # Why the planner cannot play on a board of this size, or None if it can
+    if name == 'hamiltonian' and rows % 2:
+        return f"the hamiltonian planner needs an even number of rows, got {rows}"
+    return None
+
+class Planner:
+    # Picks the AI's moves. plan() returns the cells to walk to, the first
+    # one adjacent to the head, or None to keep going straight. A snake
+    # follows the returned path while plan_is_valid() holds and asks again
+    # when it doesn't.
+    def start(self, snake):
+        pass
+
+    def plan(self, snake):
+        raise NotImplementedError
+
+class BFSPlanner(Planner):
+    # Shortest path to the apple if the snake can still reach its tail
+    # after eating, otherwise the fallbacks in Snake.set_path. The apple
+    # path can come from another search backend, such as A*, or from the
+    # time-aware search that lets the path use cells the tail will have left.
+    def __init__(self, apple_search=None, timed=False):
+        self.apple_search = apple_search
+        self.timed = timed
+
+    def start(self, snake):
+        if self.apple_search is not None:
+            snake.apple_path_finder = snake.board.path_finder(self.apple_search)
+        snake.timed_search = self.timed
+
+    def plan(self, snake):
+        return snake.set_path()
+
+CYCLES = {}
+
+def hamiltonian_cycle(rows):
+    # Column 0 from top to bottom, then the other columns row by row in a
+    # serpentine from the bottom row back up to the top. The last row ends
+    # next to (0, 0) only when the number of rows is even.
+    if rows % 2:
+        raise ValueError(f"A Hamiltonian cycle needs an even number of rows, got {rows}")
+    if rows not in CYCLES:
+        cycle = [(0, y) for y in range(rows)]
+        for i, y in enumerate(range(rows - 1, -1, -1)):
+            xs = range(1, rows) if i % 2 == 0 else range(rows - 1, 0, -1)
+            cycle.extend((x, y) for x in xs)
+        CYCLES[rows] = [x * rows + y for x, y in cycle]
+    return CYCLES[rows]
+
+class HamiltonianPlanner(Planner):
+    # Follows a cycle through every cell, which alone always wins. While
+    # the board is less than half full it may skip ahead along the cycle
+    # (the johnflux shortcut rule): the body always lies on the stretch of
+    # the cycle from the tail to the head, so any cell strictly between the
+    # head and the tail is free, and landing there keeps that true.
+    margin = 3
+
+    def __init__(self, board):
+        self.rows = board.rows
+        self.cycle = hamiltonian_cycle(board.rows)
+        self.order = None
+
+    def start(self, snake):
+        # The cycle has to run along the starting body from tail to head,
+        # in one direction or the other
+        cycle = self.cycle
+        body = list(snake.body)
+        for candidate in (cycle, cycle[::-1]):
+            order = [0] * len(candidate)
+            for index, cell in enumerate(candidate):
+                order[cell] = index
+            if all((order[body[i]] - order[body[i + 1]]) % len(order) == 1 for i in range(len(body) - 1)):
+                self.cycle, self.order = candidate, order
+                return
+        raise ValueError("The snake's body does not lie along the Hamiltonian cycle")
+
+    def plan(self, snake):
+        rows = self.rows
+        cells = len(self.cycle)
+        order = self.order
+        head = order[snake.head.pos[0] * rows + snake.head.pos[1]]
+        tail = order[snake.body[-1]]
+        apple = order[snake.apple.pos[0] * rows + snake.apple.pos[1]]
+        to_tail = (tail - head) % cells
+        to_apple = (apple - head) % cells
+
+        # How far ahead along the cycle the head may land: short of the tail
+        # with room to grow, never past the apple, and not at all once half
+        # the board is snake so the end game is a plain walk of the cycle
+        skip = 1
+        if (len(snake.body) + 1) * 2 < cells:
+            skip = max(1, min(to_tail - self.margin, to_apple))
+
+        best, best_step = self.cycle[(head + 1) % cells], 1
+        if skip > 1:
+            occupied = snake.occupied
+            for n in snake.board.neighbor_cells[self.cycle[head]]:
+                step = (order[n] - head) % cells
+                if best_step < step <= skip and not occupied[n]:
+                    best, best_step = n, step
+
+        snake.plan_branch = 'shortcut' if best_step > 1 else 'cycle'
+        return [(best // rows, best % rows)]
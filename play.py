@@ -1,87 +1,30 @@
+import argparse
 import pygame
 import sys
 import time
 from setting import *
 from snake import Snake, Square
+from board import get_board, MIN_ROWS, MAX_DRAWN_ROWS
+from render import BoardRenderer, TextCache
+from stats import GameStats, StatsStore
+from profiler import PlannerProfiler
+from planners import PLANNERS, planner_error
 from collections import deque
-import json
 from datetime import datetime
 
-class GameStats:
-    def __init__(self):
-        self.reset_session_stats()
-        self.all_time_stats = {
-            'ai_games': 0,
-            'ai_wins': 0,
-            'ai_total_score': 0,
-            'ai_best_score': 0,
-            'ai_total_time': 0,
-            'manual_games': 0,
-            'manual_wins': 0,
-            'manual_total_score': 0,
-            'manual_best_score': 0,
-            'manual_total_time': 0
-        }
-    
-    def reset_session_stats(self):
-        self.session_stats = {
-            'ai_games': 0,
-            'ai_wins': 0,
-            'ai_scores': [],
-            'manual_games': 0,
-            'manual_wins': 0,
-            'manual_scores': []
-        }
-    
-    def record_game(self, mode, score, won, game_time):
-        self.session_stats[f'{mode}_games'] += 1
-        self.session_stats[f'{mode}_scores'].append(score)
-        if won:
-            self.session_stats[f'{mode}_wins'] += 1
-        
-        self.all_time_stats[f'{mode}_games'] += 1
-        self.all_time_stats[f'{mode}_total_score'] += score
-        self.all_time_stats[f'{mode}_total_time'] += game_time
-        if score > self.all_time_stats[f'{mode}_best_score']:
-            self.all_time_stats[f'{mode}_best_score'] = score
-        if won:
-            self.all_time_stats[f'{mode}_wins'] += 1
-    
-    def get_analysis(self):
-        analysis = {}
-        
-        for mode in ['ai', 'manual']:
-            games = self.all_time_stats[f'{mode}_games']
-            if games > 0:
-                wins = self.all_time_stats[f'{mode}_wins']
-                total_score = self.all_time_stats[f'{mode}_total_score']
-                total_time = self.all_time_stats[f'{mode}_total_time']
-                
-                analysis[mode] = {
-                    'win_rate': (wins / games) * 100,
-                    'avg_score': total_score / games,
-                    'avg_time': total_time / games,
-                    'best_score': self.all_time_stats[f'{mode}_best_score'],
-                    'total_games': games
-                }
-            else:
-                analysis[mode] = {
-                    'win_rate': 0,
-                    'avg_score': 0,
-                    'avg_time': 0,
-                    'best_score': 0,
-                    'total_games': 0
-                }
-        
-        return analysis
-
 class Button:
     def __init__(self, x, y, width, height, text, font_size=24):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.font = pygame.font.Font(None, font_size)
+        self.text_surface = None
         self.hovered = False
         self.clicked = False
+
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            self.text_surface = None
     
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
@@ -97,22 +40,31 @@ class Button:
         pygame.draw.rect(surface, color, self.rect)
         pygame.draw.rect(surface, TEXT_CLR, self.rect, 2)
         
-        text_surface = self.font.render(self.text, True, TEXT_CLR)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        if self.text_surface is None:
+            self.text_surface = self.font.render(self.text, True, TEXT_CLR)
+        text_rect = self.text_surface.get_rect(center=self.rect.center)
+        surface.blit(self.text_surface, text_rect)
 
 class SnakeGame:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, rows=ROWS, skip_transitions=False, planner='bfs'):
+        # Only the modules the game uses, pygame.init() would also start audio
+        # and joysticks
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((WIDTH + 300, HEIGHT))
         pygame.display.set_caption("Advanced Snake Game - AI vs Manual")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 24)
         self.title_font = pygame.font.Font(None, 36)
+        self.text_cache = TextCache()
         
         self.current_screen = 'menu'
+        self.board = get_board(rows)
+        self.planner = planner
+        self.renderer = BoardRenderer(self.screen, self.board)
+        self.full_redraw = True
         self.snake = None
-        self.stats = GameStats()
+        self.stats = GameStats(StatsStore(STATS_FILE))
         
         self.menu_buttons = {
             'ai': Button(WIDTH + 20, 100, 260, 50, "Play AI Mode"),
@@ -125,27 +77,41 @@ class SnakeGame:
         self.game_buttons = {
             'restart': Button(WIDTH + 20, 400, 120, 40, "Restart"),
             'menu': Button(WIDTH + 160, 400, 120, 40, "Menu"),
-            'pause': Button(WIDTH + 20, 450, 260, 40, "Pause/Resume")
+            'pause': Button(WIDTH + 20, 450, 260, 40, "Pause/Resume"),
+            'speed': Button(WIDTH + 20, 500, 260, 30, "Speed: x1", 20)
+        }
+
+        self.stats_buttons = {
+            'toggle': Button(WIDTH + 20, 60, 120, 30, "Show Details", 18),
+            'back': Button(WIDTH + 160, 60, 120, 30, "Back to Menu", 18)
         }
         
         self.paused = False
         self.show_detailed_stats = False
+        self.profiler = None
+
+        # Logic ticks run on a fixed timestep of move_delay / speed, decoupled
+        # from the frame rate; lag is the simulated time still owed
+        self.speed = SPEEDS[0]
+        self.lag = 0.0
+        self.last_frame = time.perf_counter()
+        self.steps_since_render = 0
+        self.frames_skipped = 0
+
+        # A finished game stays on screen as {'result', 'restart_at'} until
+        # restart_at (None waits for the player). Fast AI speeds and
+        # skip_transitions restart AI games straight away.
+        self.game_over = None
+        self.skip_transitions = skip_transitions
 
     def draw_screen(self):
-        self.screen.fill(SURFACE_CLR)
-        
-        game_surface = self.screen.subsurface((0, 0, WIDTH, HEIGHT))
-        game_surface.fill(SURFACE_CLR)
-        
-        for i in range(ROWS + 1):
-            pygame.draw.line(game_surface, GRID_CLR, (i * SQUARE_SIZE, 0), (i * SQUARE_SIZE, HEIGHT))
-            pygame.draw.line(game_surface, GRID_CLR, (0, i * SQUARE_SIZE), (WIDTH, i * SQUARE_SIZE))
+        self.renderer.draw_background()
 
     def draw_menu(self):
-        title = self.title_font.render("SNAKE GAME", True, TEXT_CLR)
+        title = self.text_cache.render(self.title_font, "SNAKE GAME", TEXT_CLR)
         self.screen.blit(title, (WIDTH + 20, 20))
         
-        subtitle = self.font.render("Advanced AI vs Manual Analysis", True, STATS_CLR)
+        subtitle = self.text_cache.render(self.font, "Advanced AI vs Manual Analysis", STATS_CLR)
         self.screen.blit(subtitle, (WIDTH + 20, 60))
         
         for button in self.menu_buttons.values():
@@ -155,40 +121,46 @@ class SnakeGame:
         y_offset = 20
         
         mode = "AI MODE" if self.snake and self.snake.is_ai else "MANUAL MODE"
-        mode_text = self.title_font.render(mode, True, TEXT_CLR)
+        mode_text = self.text_cache.render(self.title_font, mode, TEXT_CLR)
         self.screen.blit(mode_text, (WIDTH + 20, y_offset))
         y_offset += 50
         
         if self.snake:
             stats_text = [
                 f"Score: {self.snake.score}",
-                f"Length: {len(self.snake.squares)}",
+                f"Length: {len(self.snake.body)}",
                 f"Moves: {self.snake.total_moves}",
                 f"Efficiency: {self.snake.score / max(1, self.snake.total_moves) * 100:.1f}%",
                 f"Game Time: {time.time() - self.snake.game_start_time:.1f}s"
             ]
             
             for i, text in enumerate(stats_text):
-                surface = self.font.render(text, True, TEXT_CLR)
+                surface = self.text_cache.render(self.font, text, TEXT_CLR)
                 self.screen.blit(surface, (WIDTH + 20, y_offset + i * 25))
             
             y_offset += 150
             
             if self.snake.moves_per_apple:
-                avg_moves = sum(self.snake.moves_per_apple) / len(self.snake.moves_per_apple)
+                avg_moves = self.snake.moves_per_apple.mean
                 perf_text = f"Avg Moves/Apple: {avg_moves:.1f}"
-                surface = self.font.render(perf_text, True, STATS_CLR)
+                surface = self.text_cache.render(self.font, perf_text, STATS_CLR)
                 self.screen.blit(surface, (WIDTH + 20, y_offset))
                 y_offset += 30
             
             if self.snake.is_ai and hasattr(self, 'snake') and self.snake.path:
                 ai_text = f"AI Path Length: {len(self.snake.path)}"
-                surface = self.font.render(ai_text, True, STATS_CLR)
+                surface = self.text_cache.render(self.font, ai_text, STATS_CLR)
+                self.screen.blit(surface, (WIDTH + 20, y_offset))
+                y_offset += 30
+
+            if self.snake.is_ai:
+                reuse_text = f"Plan Reuse: {self.snake.plan_hit_rate() * 100:.1f}%"
+                surface = self.text_cache.render(self.font, reuse_text, STATS_CLR)
                 self.screen.blit(surface, (WIDTH + 20, y_offset))
                 y_offset += 30
         
         session = self.stats.session_stats
-        session_title = self.font.render("SESSION STATS:", True, TEXT_CLR)
+        session_title = self.text_cache.render(self.font, "SESSION STATS:", TEXT_CLR)
         self.screen.blit(session_title, (WIDTH + 20, y_offset))
         y_offset += 30
         
@@ -198,32 +170,48 @@ class SnakeGame:
         ]
         
         for i, text in enumerate(session_text):
-            surface = self.font.render(text, True, STATS_CLR)
+            surface = self.text_cache.render(self.font, text, STATS_CLR)
             self.screen.blit(surface, (WIDTH + 20, y_offset + i * 20))
         
         if self.snake and not self.snake.is_ai:
             y_offset += 80
-            controls_title = self.font.render("CONTROLS:", True, TEXT_CLR)
+            controls_title = self.text_cache.render(self.font, "CONTROLS:", TEXT_CLR)
             self.screen.blit(controls_title, (WIDTH + 20, y_offset))
             y_offset += 25
             
             controls = ["↑/W: Up", "↓/S: Down", "←/A: Left", "→/D: Right"]
             for i, control in enumerate(controls):
-                surface = self.font.render(control, True, STATS_CLR)
+                surface = self.text_cache.render(self.font, control, STATS_CLR)
                 self.screen.blit(surface, (WIDTH + 20, y_offset + i * 20))
         
-        for button in self.game_buttons.values():
-            button.draw(self.screen)
+        for name, button in self.game_buttons.items():
+            if name != 'speed' or (self.snake and self.snake.is_ai):
+                button.draw(self.screen)
+
+        if self.profiler is not None and self.profiler.last is not None:
+            self.draw_profile(540)
+
+    def draw_profile(self, y_offset):
+        last = self.profiler.last
+        slowest = max(last['phases'], key=last['phases'].get) if last['phases'] else '-'
+        profile_text = [
+            f"Plan: {last['plan_time'] * 1000:.2f} ms (avg {self.profiler.mean_plan_time() * 1000:.2f} ms)",
+            f"Branch: {last['branch']}  Slowest: {slowest}",
+            f"BFS: {last['bfs_calls']}  Nodes: {last['nodes_expanded']}  Lookaheads: {last['lookaheads']}"
+        ]
+        for i, text in enumerate(profile_text):
+            surface = self.text_cache.render(self.font, text, STATS_CLR)
+            self.screen.blit(surface, (WIDTH + 20, y_offset + i * 20))
 
     def draw_statistics(self):
-        title = self.title_font.render("GAME STATISTICS", True, TEXT_CLR)
+        title = self.text_cache.render(self.title_font, "GAME STATISTICS", TEXT_CLR)
         self.screen.blit(title, (WIDTH + 20, 20))
         
-        toggle_text = "Hide Details" if self.show_detailed_stats else "Show Details"
-        toggle_btn = Button(WIDTH + 20, 60, 120, 30, toggle_text, 18)
+        toggle_btn = self.stats_buttons['toggle']
+        toggle_btn.set_text("Hide Details" if self.show_detailed_stats else "Show Details")
         toggle_btn.draw(self.screen)
         
-        back_btn = Button(WIDTH + 160, 60, 120, 30, "Back to Menu", 18)
+        back_btn = self.stats_buttons['back']
         back_btn.draw(self.screen)
         
         analysis = self.stats.get_analysis()
@@ -231,7 +219,7 @@ class SnakeGame:
         
         for mode in ['ai', 'manual']:
             mode_title = f"{mode.upper()} MODE ANALYSIS:"
-            title_surface = self.font.render(mode_title, True, TEXT_CLR)
+            title_surface = self.text_cache.render(self.font, mode_title, TEXT_CLR)
             self.screen.blit(title_surface, (WIDTH + 20, y_offset))
             y_offset += 30
             
@@ -245,16 +233,19 @@ class SnakeGame:
             
             if self.show_detailed_stats:
                 stats_text.append(f"Avg Game Time: {data['avg_time']:.1f}s")
+                stats_text.append(f"Moves/Apple: {data['moves_per_apple']:.1f}")
+                stats_text.append(f"Session Score p50/p90: {data['session_score_median']:.0f}/{data['session_score_p90']:.0f}")
+                stats_text.append(f"Last 100 Avg Score: {data['recent_avg_score']:.1f}")
             
             for text in stats_text:
-                surface = self.font.render(text, True, STATS_CLR)
+                surface = self.text_cache.render(self.font, text, STATS_CLR)
                 self.screen.blit(surface, (WIDTH + 30, y_offset))
                 y_offset += 20
             
             y_offset += 20
         
         if analysis['ai']['total_games'] > 0 and analysis['manual']['total_games'] > 0:
-            comp_title = self.font.render("COMPARISON:", True, TEXT_CLR)
+            comp_title = self.text_cache.render(self.font, "COMPARISON:", TEXT_CLR)
             self.screen.blit(comp_title, (WIDTH + 20, y_offset))
             y_offset += 30
             
@@ -267,7 +258,7 @@ class SnakeGame:
             ]
             
             for text in comparison_text:
-                surface = self.font.render(text, True, STATS_CLR)
+                surface = self.text_cache.render(self.font, text, STATS_CLR)
                 self.screen.blit(surface, (WIDTH + 30, y_offset))
                 y_offset += 20
         
@@ -281,7 +272,8 @@ class SnakeGame:
         elif self.menu_buttons['stats'].handle_event(event):
             self.current_screen = 'stats'
         elif self.menu_buttons['reset_stats'].handle_event(event):
-            self.stats = GameStats()
+            self.stats.clear_history()
+            self.stats = GameStats(self.stats.store)
         elif self.menu_buttons['quit'].handle_event(event):
             return 'quit'
         return None
@@ -291,14 +283,26 @@ class SnakeGame:
             if self.snake:
                 self.start_game(self.snake.is_ai)
         elif self.game_buttons['menu'].handle_event(event):
-            if self.snake:
+            if self.snake and self.game_over is None:
                 game_time, score, won = self.snake.reset()
                 mode = 'ai' if self.snake.is_ai else 'manual'
-                self.stats.record_game(mode, score, won, game_time)
+                self.stats.record_game(mode, score, won, game_time,
+                                       self.snake.total_moves, self.snake.moves_per_apple)
             self.current_screen = 'menu'
             self.snake = None
         elif self.game_buttons['pause'].handle_event(event):
             self.paused = not self.paused
+            self.full_redraw = True
+            self.lag = 0.0
+        elif self.game_buttons['speed'].handle_event(event):
+            if self.snake and self.snake.is_ai:
+                self.speed = SPEEDS[(SPEEDS.index(self.speed) + 1) % len(SPEEDS)]
+                self.game_buttons['speed'].set_text(f"Speed: x{self.speed}" if self.speed else "Speed: uncapped")
+                self.lag = 0.0
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_i:
+            self.profiler = None if self.profiler else PlannerProfiler(trace_limit=1000)
+            if self.snake:
+                self.snake.profiler = self.profiler
         return None
 
     def handle_stats_events(self, event, toggle_btn, back_btn):
@@ -308,16 +312,114 @@ class SnakeGame:
             self.current_screen = 'menu'
         return None
 
+    def advance(self, frame_time):
+        # Runs the logic ticks due for this frame and returns the last result.
+        # Ticks stop at the frame budget; if that leaves ticks still owed, the
+        # frame is not drawn so the simulation can catch up.
+        speed = self.speed if self.snake.is_ai else 1
+        deadline = time.perf_counter() + 1 / FPS
+        behind = False
+        result = 'playing'
+        if speed is None:
+            while result == 'playing' and time.perf_counter() < deadline:
+                result = self.snake.step()
+                self.steps_since_render += 1
+        else:
+            tick = self.snake.move_delay / speed
+            self.lag = min(self.lag + frame_time, tick + 1 / FPS * MAX_FRAME_SKIP)
+            while result == 'playing' and self.lag >= tick:
+                result = self.snake.step()
+                self.lag -= tick
+                self.steps_since_render += 1
+                if time.perf_counter() >= deadline:
+                    behind = self.lag >= tick
+                    break
+
+        if behind and self.frames_skipped < MAX_FRAME_SKIP:
+            self.frames_skipped += 1
+        else:
+            self.frames_skipped = 0
+        return result
+
     def start_game(self, is_ai):
         self.current_screen = 'game'
-        self.snake = Snake(self.screen.subsurface((0, 0, WIDTH, HEIGHT)), is_ai)
+        self.snake = Snake(self.screen.subsurface((0, 0, WIDTH, HEIGHT)), is_ai, board=self.board,
+                           planner=self.planner)
+        self.snake.profiler = self.profiler
+        self.snake.dirty = set()
         self.paused = False
+        self.full_redraw = True
+        self.lag = 0.0
+        self.game_over = None
+
+    def finish_game(self, result):
+        game_time, score, won = self.snake.reset()
+        mode = 'ai' if self.snake.is_ai else 'manual'
+        self.stats.record_game(mode, score, won, game_time,
+                               self.snake.total_moves, self.snake.moves_per_apple)
+
+        restart_at = None
+        if self.snake.is_ai:
+            if self.skip_transitions or self.speed != 1:
+                self.start_game(True)
+                return
+            delay = WAIT_SECONDS_AFTER_WIN if result == 'win' else WAIT_SECONDS_AFTER_DEATH
+            restart_at = time.perf_counter() + delay
+        self.game_over = {'result': result, 'restart_at': restart_at}
+        self.full_redraw = True
+
+    def draw_frame(self, events):
+        # While a game runs only the cells the snake changed and the side
+        # panel are redrawn and pushed to the display. That covers one tick,
+        # frames after several ticks redraw the whole board.
+        if (self.current_screen == 'game' and self.snake and not self.paused and self.game_over is None
+                and not self.full_redraw and self.steps_since_render <= 1):
+            self.steps_since_render = 0
+            update_rects = self.renderer.draw_changed(self.snake)
+            update_rects.append(self.renderer.clear_panel())
+            self.draw_game_ui()
+            pygame.display.update(update_rects)
+        else:
+            self.draw_screen()
+            self.steps_since_render = 0
+            
+            if self.current_screen == 'menu':
+                self.draw_menu()
+        
+            elif self.current_screen == 'game':
+                if self.snake:
+                    self.renderer.draw_snake(self.snake)
+                self.draw_game_ui()
+            
+                if self.game_over is not None:
+                    over_text = "YOU WIN!" if self.game_over['result'] == 'win' else "GAME OVER"
+                    over_text = self.text_cache.render(self.title_font, over_text, TEXT_CLR)
+                    over_rect = over_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40))
+                    pygame.draw.rect(self.screen, (0, 0, 0), over_rect.inflate(40, 20))
+                    self.screen.blit(over_text, over_rect)
+
+                if self.paused:
+                    pause_text = self.text_cache.render(self.title_font, "PAUSED", TEXT_CLR)
+                    pause_rect = pause_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+                    pygame.draw.rect(self.screen, (0, 0, 0, 128), pause_rect.inflate(40, 20))
+                    self.screen.blit(pause_text, pause_rect)
+        
+            elif self.current_screen == 'stats':
+                toggle_btn, back_btn = self.draw_statistics()
+            
+                for event in events:
+                    self.handle_stats_events(event, toggle_btn, back_btn)
+            
+            pygame.display.flip()
+            self.full_redraw = self.current_screen != 'game'
 
     def run(self):
         running = True
         
         while running:
             events = pygame.event.get()
+            now = time.perf_counter()
+            frame_time, self.last_frame = now - self.last_frame, now
             
             for event in events:
                 if event.type == pygame.QUIT:
@@ -338,47 +440,23 @@ class SnakeGame:
                     for button in button_dict.values():
                         button.handle_event(event)
             
+            skip_frame = False
             if self.current_screen == 'game' and self.snake and not self.paused:
-                result = self.snake.update(events)
-                
-                if result in ['win', 'dead', 'timeout']:
-                    game_time, score, won = self.snake.reset()
-                    mode = 'ai' if self.snake.is_ai else 'manual'
-                    self.stats.record_game(mode, score, won, game_time)
+                if self.game_over is None:
+                    self.snake.handle_events(events)
+                    result = self.advance(frame_time)
+                    skip_frame = self.frames_skipped > 0
                     
-                    if self.snake.is_ai and result != 'win':
-                        pygame.time.wait(500)
-                        self.start_game(True)
-                    elif result == 'win':
-                        pygame.time.wait(2000)
-                        if self.snake.is_ai:
-                            self.start_game(True)
-            
-            self.draw_screen()
-            
-            if self.current_screen == 'menu':
-                self.draw_menu()
-            
-            elif self.current_screen == 'game':
-                if self.snake:
-                    self.snake.draw()
-                self.draw_game_ui()
-                
-                if self.paused:
-                    pause_text = self.title_font.render("PAUSED", True, TEXT_CLR)
-                    pause_rect = pause_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-                    pygame.draw.rect(self.screen, (0, 0, 0, 128), pause_rect.inflate(40, 20))
-                    self.screen.blit(pause_text, pause_rect)
-            
-            elif self.current_screen == 'stats':
-                toggle_btn, back_btn = self.draw_statistics()
-                
-                for event in events:
-                    self.handle_stats_events(event, toggle_btn, back_btn)
+                    if result in ['win', 'dead', 'timeout']:
+                        self.finish_game(result)
+                elif self.game_over['restart_at'] is not None and now >= self.game_over['restart_at']:
+                    self.start_game(True)
             
-            pygame.display.flip()
+            if not skip_frame:
+                self.draw_frame(events)
             self.clock.tick(FPS)
         
+        self.stats.flush()
         pygame.quit()
         sys.exit()
 
@@ -508,8 +586,24 @@ class GameAnalyzer:
         }
 
 def main():
+    parser = argparse.ArgumentParser(description="Snake with an AI and a manual mode")
+    parser.add_argument('rows', type=int, nargs='?', default=ROWS, help="board size")
+    parser.add_argument('--skip-transitions', action='store_true',
+                        help="restart AI games without showing the result")
+    parser.add_argument('--planner', choices=PLANNERS, default='bfs',
+                        help="AI strategy; timed plans about three times slower than bfs and times out "
+                             "more often on small boards, "
+                             "hamiltonian needs an even number of rows")
+    args = parser.parse_args()
+    if args.rows < MIN_ROWS:
+        parser.error(f"the board needs at least {MIN_ROWS} rows, got {args.rows}")
+    if args.rows > MAX_DRAWN_ROWS:
+        parser.error(f"the window fits at most {MAX_DRAWN_ROWS} rows, got {args.rows}; use headless.py for bigger boards")
+    error = planner_error(args.planner, args.rows)
+    if error:
+        parser.error(error)
     try:
-        game = SnakeGame()
+        game = SnakeGame(args.rows, args.skip_transitions, args.planner)
         game.run()
     except Exception as e:
         print(f"Game error: {e}")
@@ -0,0 +1,78 @@
+import json
+import time
+from collections import deque
+
+PHASES = ['apple_bfs', 'tail_check', 'longest_path', 'any_safe_move', 'path_to_tail']
+
+class PlannerProfiler:
+    # Per-tick timings and counters for Snake.set_path. A snake only pays for
+    # this when its profiler attribute is set, so the hooks cost one
+    # attribute check when profiling is off. The last trace_limit ticks are
+    # kept in trace; with trace_path every tick is also written there as a
+    # JSON line as it ends, so a long run needs no trace in memory.
+    def __init__(self, trace_limit=None, trace_path=None):
+        self.trace = deque(maxlen=trace_limit)
+        self.trace_file = open(trace_path, 'w') if trace_path else None
+        self.totals = {'ticks': 0, 'plan_time': 0.0, 'bfs_calls': 0, 'nodes_expanded': 0, 'lookaheads': 0,
+                       'phases': {phase: 0.0 for phase in PHASES}}
+        self.branches = {}
+        self.last = None
+        self.tick = None
+
+    def begin_tick(self, tick):
+        self.tick = {
+            'tick': tick,
+            'branch': None,
+            'plan_time': 0.0,
+            'phases': {},
+            'bfs_calls': 0,
+            'nodes_expanded': 0,
+            'lookaheads': 0
+        }
+        self.tick_start = time.perf_counter()
+
+    def lap(self, phase, start):
+        now = time.perf_counter()
+        phases = self.tick['phases']
+        phases[phase] = phases.get(phase, 0.0) + now - start
+        self.totals['phases'][phase] += now - start
+        return now
+
+    def count_search(self, path_finder, path):
+        self.tick['bfs_calls'] += 1
+        self.tick['nodes_expanded'] += path_finder.expanded(bool(path))
+
+    def count_lookahead(self):
+        self.tick['lookaheads'] += 1
+
+    def end_tick(self, branch):
+        tick = self.tick
+        tick['branch'] = branch
+        tick['plan_time'] = time.perf_counter() - self.tick_start
+        self.trace.append(tick)
+        if self.trace_file is not None:
+            self.trace_file.write(json.dumps(tick) + '\n')
+        self.last = tick
+        self.tick = None
+
+        totals = self.totals
+        totals['ticks'] += 1
+        totals['plan_time'] += tick['plan_time']
+        totals['bfs_calls'] += tick['bfs_calls']
+        totals['nodes_expanded'] += tick['nodes_expanded']
+        totals['lookaheads'] += tick['lookaheads']
+        self.branches[branch] = self.branches.get(branch, 0) + 1
+
+    def mean_plan_time(self):
+        return self.totals['plan_time'] / max(1, self.totals['ticks'])
+
+    def export(self, path):
+        # One JSON object per tick kept in trace
+        with open(path, 'w') as f:
+            for tick in self.trace:
+                f.write(json.dumps(tick) + '\n')
+
+    def close(self):
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = None
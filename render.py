@@ -0,0 +1,112 @@
+import pygame
+from collections import OrderedDict
+from setting import *
+
+class BoardRenderer:
+    # Draws the board from a background rendered once, so a frame only has
+    # to restore and redraw the cells the snake changed since the last one
+    def __init__(self, screen, board):
+        self.screen = screen
+        self.board = board
+        self.board_rect = pygame.Rect(0, 0, WIDTH, HEIGHT)
+        self.panel_rect = pygame.Rect(WIDTH, 0, screen.get_width() - WIDTH, HEIGHT)
+
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill(SURFACE_CLR)
+        ss = board.square_size
+        for i in range(board.rows + 1):
+            pygame.draw.line(self.background, GRID_CLR, (i * ss, 0), (i * ss, HEIGHT))
+            pygame.draw.line(self.background, GRID_CLR, (0, i * ss), (WIDTH, i * ss))
+
+    def draw_background(self):
+        self.screen.blit(self.background, (0, 0))
+
+    def draw_snake(self, snake):
+        snake.draw()
+        snake.dirty.clear()
+
+    def draw_changed(self, snake):
+        # Segments draw up to GAP_SIZE into the cell behind them, so each
+        # dirty cell is restored with that margin before the ends are redrawn
+        ss, gs = self.board.square_size, GAP_SIZE
+        rects = []
+        for x, y in snake.dirty:
+            rect = pygame.Rect(x * ss, y * ss, ss, ss).inflate(2 * gs, 2 * gs).clip(self.board_rect)
+            if rect:
+                self.screen.blit(self.background, rect, rect)
+                rects.append(rect)
+        snake.draw_ends()
+        snake.dirty.clear()
+        return rects
+
+    def clear_panel(self):
+        self.screen.blit(self.background, self.panel_rect, self.panel_rect)
+        return self.panel_rect
+
+class TextCache:
+    # Rendered text surfaces keyed by font, text and colour. Labels that do not
+    # change are rasterized once, and the least recently used entries are
+    # dropped once the cache is full so changing values cannot grow it.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.maxsize:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+ATLASES = {}
+
+def get_atlas(square_size):
+    if square_size not in ATLASES:
+        ATLASES[square_size] = SpriteAtlas(square_size)
+    return ATLASES[square_size]
+
+class SpriteAtlas:
+    # Every look a square can have, drawn once side by side on one surface.
+    # A segment reaches GAP_SIZE into the cell behind it, so each sprite is
+    # a cell plus a gap on every side, blitted GAP_SIZE up and left of the
+    # cell, with the unused pixels keyed out so the grid shows through.
+    colors = [SNAKE_CLR, HEAD_CLR, APPLE_CLR, VIRTUAL_SNAKE_CLR]
+    key_color = (255, 0, 255)
+
+    def __init__(self, square_size):
+        ss, gs = square_size, GAP_SIZE
+        self.square_size = square_size
+        size = ss + 2 * gs
+        # Segment rects by the direction the segment moved in, relative to
+        # the sprite; 'end' is the tail and the apple
+        shapes = {
+            'end': (2 * gs, 2 * gs, ss - 2 * gs, ss - 2 * gs),
+            (-1, 0): (2 * gs, 2 * gs, ss, ss - 2 * gs),
+            (1, 0): (0, 2 * gs, ss, ss - 2 * gs),
+            (0, 1): (2 * gs, 0, ss - 2 * gs, ss),
+            (0, -1): (2 * gs, 2 * gs, ss - 2 * gs, ss)
+        }
+        self.surface = pygame.Surface((size * len(shapes) * len(self.colors), size))
+        self.surface.fill(self.key_color)
+        self.surface.set_colorkey(self.key_color, pygame.RLEACCEL)
+        self.areas = {}
+        for i, (clr, (kind, shape)) in enumerate((clr, item) for clr in self.colors for item in shapes.items()):
+            left = i * size
+            pygame.draw.rect(self.surface, clr, (left + shape[0], shape[1], shape[2], shape[3]))
+            self.areas[clr, kind] = pygame.Rect(left, 0, size, size)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+
+    def blit(self, clr, sqr):
+        # One (source, dest, area) entry for Surface.blits
+        if sqr.is_tail or sqr.is_apple:
+            kind = 'end'
+        else:
+            kind = (sqr.dir[0], sqr.dir[1])
+        ss, gs = self.square_size, GAP_SIZE
+        return self.surface, (sqr.pos[0] * ss - gs, sqr.pos[1] * ss - gs), self.areas[clr, kind]
@@ -0,0 +1,164 @@
+from collections import deque
+from heapq import heappush, heappop
+
+def make_path_finder(backend, neighbors, rows):
+    if backend == 'python':
+        return BFS(neighbors)
+    if backend == 'astar':
+        return AStar(neighbors, rows)
+    if backend == 'numpy':
+        from flood import FloodFill
+        return FloodFill(neighbors, rows)
+    raise ValueError(f"Unknown search backend: {backend}")
+
+class BFS:
+    # Breadth-first search over flat cell indices. The visited marks and
+    # parent links are allocated once and invalidated by bumping the
+    # generation counter, so a search allocates nothing but its result.
+    def __init__(self, neighbors):
+        self.neighbors = neighbors
+        self.visited = [0] * len(neighbors)
+        self.parent = [0] * len(neighbors)
+        self.generation = 0
+        self.queue = deque()
+
+    def search(self, blocked, start, goal):
+        self.generation += 1
+        generation = self.generation
+        visited = self.visited
+        parent = self.parent
+        neighbors = self.neighbors
+        queue = self.queue
+        queue.clear()
+
+        visited[start] = generation
+        queue.append(start)
+        while queue:
+            node = queue.popleft()
+            for next_node in neighbors[node]:
+                if visited[next_node] != generation and not blocked[next_node]:
+                    visited[next_node] = generation
+                    parent[next_node] = node
+                    if next_node == goal:
+                        return self.trace(start, goal)
+                    queue.append(next_node)
+        return []
+
+    def reachable(self, blocked, start, goal):
+        # Whether search() would find a path, for callers that only need that
+        return bool(self.search(blocked, start, goal))
+
+    def search_timed(self, stamps, start, goal, horizon):
+        # Search where the body moves on as the path grows: a cell stamped
+        # with the tick the head entered it can be entered on step t once
+        # stamp < horizon + t, horizon being the tail's stamp. That only
+        # gets easier with t, so the first visit of a cell is its earliest
+        # and plain breadth-first order still finds the shortest path.
+        self.generation += 1
+        generation = self.generation
+        visited = self.visited
+        parent = self.parent
+        neighbors = self.neighbors
+        queue = self.queue
+        queue.clear()
+
+        visited[start] = generation
+        queue.append(start)
+        limit = horizon
+        while queue:
+            limit += 1
+            for _ in range(len(queue)):
+                node = queue.popleft()
+                for next_node in neighbors[node]:
+                    if visited[next_node] != generation and stamps[next_node] < limit:
+                        visited[next_node] = generation
+                        parent[next_node] = node
+                        if next_node == goal:
+                            return self.trace(start, goal)
+                        queue.append(next_node)
+        return []
+
+    def expanded(self, found):
+        # Nodes taken off the queue by the last search. Only called when
+        # profiling, so the search loop itself stays free of counters.
+        discovered = self.visited.count(self.generation)
+        return discovered - len(self.queue) - (1 if found else 0)
+
+    def trace(self, start, goal):
+        path = []
+        node = goal
+        while node != start:
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        return path
+
+class AStar:
+    # A* over flat cell indices with the Manhattan distance as heuristic.
+    # Equal f scores go to the node nearer the goal and then to the one
+    # nearer the straight line from start to goal, so paths run straight
+    # and few nodes off that line are expanded. With unit steps and this
+    # heuristic the path is already shortest when the goal is first
+    # reached, so the search stops there like BFS does.
+    def __init__(self, neighbors, rows):
+        self.neighbors = neighbors
+        self.rows = rows
+        self.seen = [0] * len(neighbors)
+        self.cost = [0] * len(neighbors)
+        self.parent = [0] * len(neighbors)
+        self.generation = 0
+        self.last_expanded = 0
+
+    def search(self, blocked, start, goal):
+        self.generation += 1
+        generation = self.generation
+        seen = self.seen
+        cost = self.cost
+        parent = self.parent
+        neighbors = self.neighbors
+        rows = self.rows
+        goal_x, goal_y = divmod(goal, rows)
+        start_x, start_y = divmod(start, rows)
+        line_x, line_y = start_x - goal_x, start_y - goal_y
+
+        seen[start] = generation
+        cost[start] = 0
+        heap = [(0, 0, 0, start)]
+        expanded = 0
+        while heap:
+            f, h, _, node = heappop(heap)
+            g = cost[node]
+            if g + h < f:
+                continue
+            expanded += 1
+            g += 1
+            for next_node in neighbors[node]:
+                if blocked[next_node] or (seen[next_node] == generation and cost[next_node] <= g):
+                    continue
+                seen[next_node] = generation
+                cost[next_node] = g
+                parent[next_node] = node
+                if next_node == goal:
+                    self.last_expanded = expanded
+                    return self.trace(start, goal)
+                x, y = divmod(next_node, rows)
+                dx, dy = x - goal_x, y - goal_y
+                h = abs(dx) + abs(dy)
+                heappush(heap, (g + h, h, abs(dx * line_y - line_x * dy), next_node))
+        self.last_expanded = expanded
+        return []
+
+    def expanded(self, found):
+        return self.last_expanded
+
+    def reachable(self, blocked, start, goal):
+        return bool(self.search(blocked, start, goal))
+
+    def trace(self, start, goal):
+        path = []
+        node = goal
+        while node != start:
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        return path
@@ -19,22 +19,24 @@ STATS_CLR = (200, 200, 200)
 
 # Game Settings
 FPS = 15
+SPEEDS = [1, 10, 100, None]  # AI ticks per move_delay, None runs as many as fit in a frame
+MAX_FRAME_SKIP = 5  # Frames that may go undrawn while the simulation catches up
 INITIAL_SNAKE_LENGTH = 3
 WAIT_SECONDS_AFTER_WIN = 3
+WAIT_SECONDS_AFTER_DEATH = 0.5
+STATS_FILE = 'snake_stats.jsonl'  # Every finished game is appended here
 MAX_MOVES_WITHOUT_EATING = ROWS * ROWS * ROWS * 2
 SNAKE_MAX_LENGTH = ROWS * ROWS - INITIAL_SNAKE_LENGTH
 
 # Grid and pathfinding setup
-GRID = [[i, j] for i in range(ROWS) for j in range(ROWS)]
-
-def get_neighbors(position):
+def get_neighbors(position, rows=ROWS):
     neighbors = [[position[0] + 1, position[1]],
                  [position[0] - 1, position[1]],
                  [position[0], position[1] + 1],
                  [position[0], position[1] - 1]]
     in_grid_neighbors = []
     for pos in neighbors:
-        if pos in GRID:
+        if 0 <= pos[0] < rows and 0 <= pos[1] < rows:
             in_grid_neighbors.append(pos)
     return in_grid_neighbors
 
@@ -43,4 +45,33 @@ def distance(pos1, pos2):
     y1, y2 = pos1[1], pos2[1]
     return abs(x2 - x1) + abs(y2 - y1)
 
-ADJACENCY_DICT = {tuple(pos): get_neighbors(pos) for pos in GRID}
\ No newline at end of file
+# Neighbors of every cell as flat indices (x * rows + y), in get_neighbors order
+def build_neighbor_cells(rows):
+    neighbors = []
+    for x in range(rows):
+        for y in range(rows):
+            cells = []
+            if x + 1 < rows:
+                cells.append((x + 1) * rows + y)
+            if x > 0:
+                cells.append((x - 1) * rows + y)
+            if y + 1 < rows:
+                cells.append(x * rows + y + 1)
+            if y > 0:
+                cells.append(x * rows + y - 1)
+            neighbors.append(cells)
+    return neighbors
+
+# GRID and ADJACENCY_DICT describe the default board and are built the
+# first time they are looked up, so importing the settings stays cheap. They
+# are not picked up by `from setting import *`, import them by name. Boards
+# of any size build their own tables, see board.get_board.
+def __getattr__(name):
+    if name == 'GRID':
+        value = [[i, j] for i in range(ROWS) for j in range(ROWS)]
+    elif name == 'ADJACENCY_DICT':
+        value = {(i, j): get_neighbors([i, j]) for i in range(ROWS) for j in range(ROWS)}
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
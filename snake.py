@@ -1,121 +1,160 @@
-import pygame
+import math
 import time
-from copy import deepcopy
-from random import randrange
+from time import perf_counter
+from collections import deque
+from random import Random
 from setting import *
+from board import get_board
+from stats import RunningStats
+from planners import make_planner
+
+def sprite_atlas(square_size):
+    # Drawing is the only part of the game that needs pygame, so render is
+    # imported on first draw and headless games never load it
+    from render import get_atlas
+    return get_atlas(square_size)
+
+# Body cell of a head that went through the wall, the game is over by then
+OFF_BOARD = -1
 
 class Square:
-    def __init__(self, pos, surface, is_apple=False):
-        self.pos = pos
+    # The head, the apple, or a body segment as drawn. Positions and
+    # directions are (x, y) tuples.
+    __slots__ = ('pos', 'surface', 'board', 'is_apple', 'is_tail', 'dir')
+
+    def __init__(self, pos, surface, is_apple=False, board=None):
+        self.pos = tuple(pos)
         self.surface = surface
+        self.board = board if board is not None else get_board()
         self.is_apple = is_apple
         self.is_tail = False
-        self.dir = [-1, 0]
+        self.dir = (-1, 0)
 
         if self.is_apple:
-            self.dir = [0, 0]
+            self.dir = (0, 0)
 
     def draw(self, clr=SNAKE_CLR):
-        x, y = self.pos[0], self.pos[1]
-        ss, gs = SQUARE_SIZE, GAP_SIZE
-
-        if self.dir == [-1, 0]:
-            if self.is_tail:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss - 2*gs))
-            else:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss, ss - 2*gs))
-
-        if self.dir == [1, 0]:
-            if self.is_tail:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss - 2*gs))
-            else:
-                pygame.draw.rect(self.surface, clr, (x * ss - gs, y * ss + gs, ss, ss - 2*gs))
-
-        if self.dir == [0, 1]:
-            if self.is_tail:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss - 2*gs))
-            else:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss - gs, ss - 2*gs, ss))
-
-        if self.dir == [0, -1]:
-            if self.is_tail:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss - 2*gs))
-            else:
-                pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss))
-
-        if self.is_apple:
-            pygame.draw.rect(self.surface, clr, (x * ss + gs, y * ss + gs, ss - 2*gs, ss - 2*gs))
-
-    def move(self, direction):
-        self.dir = direction
-        self.pos[0] += self.dir[0]
-        self.pos[1] += self.dir[1]
+        self.surface.blit(*sprite_atlas(self.board.square_size).blit(clr, self))
 
     def hitting_wall(self):
-        if (self.pos[0] <= -1) or (self.pos[0] >= ROWS) or (self.pos[1] <= -1) or (self.pos[1] >= ROWS):
+        rows = self.board.rows
+        if (self.pos[0] <= -1) or (self.pos[0] >= rows) or (self.pos[1] <= -1) or (self.pos[1] >= rows):
             return True
         else:
             return False
 
 class Snake:
-    def __init__(self, surface, is_ai=True):
+    def __init__(self, surface=None, is_ai=True, rng=None, backend='python', board=None, planner='bfs'):
         self.surface = surface
         self.is_ai = is_ai
+        self.rng = rng if rng is not None else Random()
+        self.board = board if board is not None else get_board()
+        self.backend = backend
+        self.path_finder = self.board.path_finder(backend)
+        self.apple_path_finder = self.path_finder
+        # Plan the apple phase with search_timed over self.stamps instead of
+        # a BFS, a virtual snake and a second BFS
+        self.timed_search = False
         self.is_dead = False
-        self.squares_start_pos = [[ROWS // 2 + i, ROWS // 2] for i in range(INITIAL_SNAKE_LENGTH)]
-        self.turns = {}
-        self.dir = [-1, 0]
+        rows = self.board.rows
+        self.squares_start_pos = [(rows // 2 + i, rows // 2) for i in range(INITIAL_SNAKE_LENGTH)]
+        self.dir = (-1, 0)
         self.score = 0
         self.moves_without_eating = 0
-        self.apple = Square([randrange(ROWS), randrange(ROWS)], self.surface, is_apple=True)
         self.move_delay = 0.1 if is_ai else 0.15
         self.last_move_time = time.time()
         self.game_start_time = time.time()
 
-        self.squares = []
+        # The body is the flat cells (x * rows + y) from the head to the tail,
+        # so a move pushes the new head cell and pops the tail cell. The head
+        # Square tracks the head's position, which can be off the board.
+        self.body = deque()
+        self.clear_cells()
         for pos in self.squares_start_pos:
-            self.squares.append(Square(pos, self.surface))
-
-        self.head = self.squares[0]
-        self.tail = self.squares[-1]
-        self.tail.is_tail = True
-
+            self.body.append(pos[0] * rows + pos[1])
+            self.occupy(pos)
+        self.restamp()
+        self.head = Square(self.squares_start_pos[0], self.surface, board=self.board)
+        # The cell the tail left on the last move, which it grows back into
+        self.last_tail = None
+        # Set to a set() to collect the (x, y) cells whose drawing changes,
+        # which lets a renderer redraw only those
+        self.dirty = None
+        self.generate_apple()
+
+        self.planner = make_planner(planner, self.board)
+        self.planner.start(self)
         self.path = []
+        # A validated path to the apple stays valid until the apple moves, so
+        # it is followed across ticks instead of replanning every move
+        self.reuse_plan = True
+        self.plan_apple = None
+        self.plan_stats = {'replans': 0, 'reused': 0}
+        self.plan_branch = None
+        # Set to a profiler.PlannerProfiler to record per-tick planner timings
+        self.profiler = None
         self.is_virtual_snake = False
         self.total_moves = 0
         self.won_game = False
-        self.moves_per_apple = []
+        self.moves_per_apple = RunningStats()
         self.current_moves_for_apple = 0
 
+    @property
+    def squares(self):
+        # Square views of the whole snake from the head to the tail
+        cells = list(self.body)
+        return [self.head] + [self.segment(cells, i) for i in range(1, len(cells))]
+
+    def segment(self, cells, index):
+        # Square view of the body cell at index (not the head), facing the way
+        # it last moved: away from the cell behind it, which it came from
+        rows = self.board.rows
+        cell = cells[index]
+        sqr = Square((cell // rows, cell % rows), self.surface, board=self.board)
+        if index == len(cells) - 1:
+            sqr.is_tail = True
+        else:
+            step = cell - cells[index + 1]
+            sqr.dir = (step // rows, 0) if step in (rows, -rows) else (0, step)
+        return sqr
+
     def draw(self):
-        self.apple.draw(APPLE_CLR)
-        self.head.draw(HEAD_CLR)
-        for sqr in self.squares[1:]:
-            if self.is_virtual_snake:
-                sqr.draw(VIRTUAL_SNAKE_CLR)
-            else:
-                sqr.draw()
+        # The whole snake goes out as one batch of blits from the sprite atlas
+        atlas = sprite_atlas(self.board.square_size)
+        clr = VIRTUAL_SNAKE_CLR if self.is_virtual_snake else SNAKE_CLR
+        sprites = [atlas.blit(APPLE_CLR, self.apple), atlas.blit(HEAD_CLR, self.head)]
+        sprites.extend([atlas.blit(clr, sqr) for sqr in self.squares[1:]])
+        self.surface.blits(sprites, False)
+
+    def draw_ends(self):
+        # A move only changes the cells at the two ends of the body and the
+        # apple, every other segment looks the same as before. After growing,
+        # the segment three from the end reaches into a changed cell too.
+        atlas = sprite_atlas(self.board.square_size)
+        clr = VIRTUAL_SNAKE_CLR if self.is_virtual_snake else SNAKE_CLR
+        sprites = [atlas.blit(APPLE_CLR, self.apple), atlas.blit(HEAD_CLR, self.head)]
+        body = self.body
+        for i in [1] + list(range(max(2, len(body) - 3), len(body))):
+            sprites.append(atlas.blit(clr, self.segment(body, i)))
+        self.surface.blits(sprites, False)
 
     def set_direction(self, direction):
         if direction == 'left':
-            if not self.dir == [1, 0]:
-                self.dir = [-1, 0]
-                self.turns[self.head.pos[0], self.head.pos[1]] = self.dir
+            if not self.dir == (1, 0):
+                self.dir = (-1, 0)
         if direction == "right":
-            if not self.dir == [-1, 0]:
-                self.dir = [1, 0]
-                self.turns[self.head.pos[0], self.head.pos[1]] = self.dir
+            if not self.dir == (-1, 0):
+                self.dir = (1, 0)
         if direction == "up":
-            if not self.dir == [0, 1]:
-                self.dir = [0, -1]
-                self.turns[self.head.pos[0], self.head.pos[1]] = self.dir
+            if not self.dir == (0, 1):
+                self.dir = (0, -1)
         if direction == "down":
-            if not self.dir == [0, -1]:
-                self.dir = [0, 1]
-                self.turns[self.head.pos[0], self.head.pos[1]] = self.dir
+            if not self.dir == (0, -1):
+                self.dir = (0, 1)
 
     def handle_events(self, events):
         if not self.is_ai:
+            import pygame
             keys = pygame.key.get_pressed()
             if keys[pygame.K_LEFT] or keys[pygame.K_a]:
                 self.set_direction('left')
@@ -126,55 +165,116 @@ class Snake:
             elif keys[pygame.K_DOWN] or keys[pygame.K_s]:
                 self.set_direction('down')
 
+    def clear_cells(self):
+        cells = self.board.cells
+        self.occupied = bytearray(cells)
+        # Every free cell, in no particular order, and where each cell sits in
+        # that list, so cells can be swap-removed and appended in O(1)
+        self.free_cells = list(range(cells))
+        self.free_index = list(range(cells))
+        # The move on which the head entered each cell. Along the body they
+        # count up by one from the tail, cells that were never entered stay -1.
+        self.stamps = [-1] * cells
+        self.clock = 0
+
+    def restamp(self):
+        for cell in reversed(self.body):
+            self.stamps[cell] = self.clock
+            self.clock += 1
+
+    def occupy(self, position):
+        rows = self.board.rows
+        if 0 <= position[0] < rows and 0 <= position[1] < rows:
+            self.occupy_cell(position[0] * rows + position[1])
+
+    def vacate(self, position):
+        rows = self.board.rows
+        if 0 <= position[0] < rows and 0 <= position[1] < rows:
+            self.vacate_cell(position[0] * rows + position[1])
+
+    def occupy_cell(self, cell):
+        if not self.occupied[cell]:
+            index = self.free_index[cell]
+            last = self.free_cells.pop()
+            if last != cell:
+                self.free_cells[index] = last
+                self.free_index[last] = index
+        self.occupied[cell] += 1
+
+    def vacate_cell(self, cell):
+        self.occupied[cell] -= 1
+        if not self.occupied[cell]:
+            self.free_index[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
+
     def move(self):
-        for j, sqr in enumerate(self.squares):
-            p = (sqr.pos[0], sqr.pos[1])
-            if p in self.turns:
-                turn = self.turns[p]
-                sqr.move([turn[0], turn[1]])
-                if j == len(self.squares) - 1:
-                    self.turns.pop(p)
-            else:
-                sqr.move(sqr.dir)
+        # Every segment steps into the cell of the one ahead of it, so the
+        # body only loses its tail cell and gains the new head cell
+        rows = self.board.rows
+        body = self.body
+        head = self.head
+        tail = body.pop()
+        if tail != OFF_BOARD:
+            self.vacate_cell(tail)
+        self.last_tail = tail
+        x, y = head.pos[0] + self.dir[0], head.pos[1] + self.dir[1]
+        if self.dirty is not None:
+            self.dirty.add((tail // rows, tail % rows))
+            self.dirty.add(head.pos)
+            self.dirty.add((x, y))
+            self.dirty.add((body[-1] // rows, body[-1] % rows))
+        head.pos = (x, y)
+        head.dir = self.dir
+        if 0 <= x < rows and 0 <= y < rows:
+            cell = x * rows + y
+            body.appendleft(cell)
+            self.occupy_cell(cell)
+            self.stamps[cell] = self.clock
+        else:
+            body.appendleft(OFF_BOARD)
+        self.clock += 1
         self.moves_without_eating += 1
         self.current_moves_for_apple += 1
 
     def add_square(self):
-        self.squares[-1].is_tail = False
-        tail = self.squares[-1]
-
-        direction = tail.dir
-        if direction == [1, 0]:
-            self.squares.append(Square([tail.pos[0] - 1, tail.pos[1]], self.surface))
-        if direction == [-1, 0]:
-            self.squares.append(Square([tail.pos[0] + 1, tail.pos[1]], self.surface))
-        if direction == [0, 1]:
-            self.squares.append(Square([tail.pos[0], tail.pos[1] - 1], self.surface))
-        if direction == [0, -1]:
-            self.squares.append(Square([tail.pos[0], tail.pos[1] + 1], self.surface))
-
-        self.squares[-1].dir = direction
-        self.squares[-1].is_tail = True
+        # The tail grows back into the cell it left on the last move. A stamp
+        # only describes one visit, so a cell the body still holds keeps the
+        # stamp of its later one.
+        tail = self.body[-1]
+        cell = self.last_tail
+        self.body.append(cell)
+        self.occupy_cell(cell)
+        if self.occupied[cell] == 1:
+            self.stamps[cell] = self.stamps[tail] - 1
+        if self.dirty is not None:
+            rows = self.board.rows
+            self.dirty.add((tail // rows, tail % rows))
+            self.dirty.add((cell // rows, cell % rows))
 
     def reset(self):
         game_time = time.time() - self.game_start_time
         return game_time, self.score, self.won_game
 
     def hitting_self(self):
-        for sqr in self.squares[1:]:
-            if sqr.pos == self.head.pos:
-                return True
+        x, y = self.head.pos
+        rows = self.board.rows
+        if 0 <= x < rows and 0 <= y < rows:
+            return self.occupied[x * rows + y] > 1
+        return False
 
     def generate_apple(self):
-        self.apple = Square([randrange(ROWS), randrange(ROWS)], self.surface, is_apple=True)
-        if not self.is_position_free(self.apple.pos):
-            self.generate_apple()
+        # A board without free cells keeps its old apple
+        if self.free_cells:
+            cell = self.free_cells[self.rng.randrange(len(self.free_cells))]
+            rows = self.board.rows
+            self.apple = Square((cell // rows, cell % rows), self.surface, is_apple=True, board=self.board)
+            if self.dirty is not None:
+                self.dirty.add(self.apple.pos)
 
     def eating_apple(self):
         if self.head.pos == self.apple.pos and not self.is_virtual_snake and not self.won_game:
-            self.generate_apple()
             self.moves_without_eating = 0
-            self.moves_per_apple.append(self.current_moves_for_apple)
+            self.moves_per_apple.add(self.current_moves_for_apple)
             self.current_moves_for_apple = 0
             self.score += 1
             return True
@@ -190,73 +290,125 @@ class Snake:
             self.set_direction('down')
 
     def is_position_free(self, position):
-        if position[0] >= ROWS or position[0] < 0 or position[1] >= ROWS or position[1] < 0:
+        rows = self.board.rows
+        if position[0] >= rows or position[0] < 0 or position[1] >= rows or position[1] < 0:
             return False
-        for sqr in self.squares:
-            if sqr.pos == position:
-                return False
-        return True
-
-    def bfs(self, s, e):
-        q = [s]
-        visited = {tuple(pos): False for pos in GRID}
-        visited[s] = True
-        prev = {tuple(pos): None for pos in GRID}
-
-        while q:
-            node = q.pop(0)
-            neighbors = ADJACENCY_DICT[node]
-            for next_node in neighbors:
-                if self.is_position_free(next_node) and not visited[tuple(next_node)]:
-                    q.append(tuple(next_node))
-                    visited[tuple(next_node)] = True
-                    prev[tuple(next_node)] = node
-
-        path = list()
-        p_node = e
-
-        start_node_found = False
-        while not start_node_found:
-            if prev[p_node] is None:
-                return []
-            p_node = prev[p_node]
-            if p_node == s:
-                path.append(e)
-                return path
-            path.insert(0, p_node)
+        return not self.occupied[position[0] * rows + position[1]]
 
-        return []
+    def bfs(self, s, e, path_finder=None):
+        rows = self.board.rows
+        path_finder = path_finder or self.path_finder
+        path = path_finder.search(self.occupied, s[0] * rows + s[1], e[0] * rows + e[1])
+        if self.profiler is not None:
+            self.profiler.count_search(path_finder, path)
+        return [(cell // rows, cell % rows) for cell in path]
 
     def create_virtual_snake(self):
-        v_snake = Snake(self.surface, self.is_ai)
-        for i in range(len(self.squares) - len(v_snake.squares)):
-            v_snake.add_square()
-
-        for i, sqr in enumerate(v_snake.squares):
-            sqr.pos = deepcopy(self.squares[i].pos)
-            sqr.dir = deepcopy(self.squares[i].dir)
-
-        v_snake.dir = deepcopy(self.dir)
-        v_snake.turns = deepcopy(self.turns)
-        v_snake.apple.pos = deepcopy(self.apple.pos)
-        v_snake.apple.is_apple = True
+        # The copy draws its starting apple from its own Random, so making
+        # one leaves the seeded game's sequence alone
+        v_snake = Snake(self.surface, self.is_ai, Random(), self.backend, self.board)
+        v_snake.body = deque(self.body)
+        v_snake.head.pos = self.head.pos
+        v_snake.head.dir = self.head.dir
+        v_snake.last_tail = self.last_tail
+        v_snake.dir = self.dir
+        v_snake.apple.pos = self.apple.pos
+        v_snake.occupied = bytearray(self.occupied)
+        v_snake.free_cells = self.free_cells[:]
+        v_snake.free_index = self.free_index[:]
+        v_snake.stamps = self.stamps[:]
+        v_snake.clock = self.clock
         v_snake.is_virtual_snake = True
 
         return v_snake
 
+    def timed_apple_path(self):
+        # Path to the apple through cells the tail will have left by the time
+        # the head gets there. It is kept only if, once the snake has walked
+        # it and grown, the tail can be reached through cells that are free
+        # right then. A timed check of that second leg has no slack for the
+        # tail stalling when the snake eats again on the way, so it is the
+        # static check the BFS planner uses. The occupancy after the walk is
+        # set up directly instead of moving a VirtualSnake along the path.
+        rows = self.board.rows
+        finder = self.board.path_finder('python')
+        head = self.head.pos[0] * rows + self.head.pos[1]
+        apple = self.apple.pos[0] * rows + self.apple.pos[1]
+
+        path = finder.search_timed(self.stamps, head, apple, self.stamps[self.body[-1]])
+        if self.profiler is not None:
+            self.profiler.count_search(finder, path)
+        if not path or path[0] == self.body[1]:
+            return [], False
+
+        # The cells the body runs through from the tail, then the path. After
+        # len(path) moves and a step of growth the tail has left the first
+        # len(path) - 1 of them and stands on the next, which the search may
+        # end on.
+        occupied = self.occupied
+        trail = list(reversed(self.body)) + path
+        left = trail[:len(path) - 1]
+        tail = trail[len(path) - 1]
+        for cell in path:
+            occupied[cell] += 1
+        for cell in left:
+            occupied[cell] -= 1
+        occupied[tail] -= 1
+        safe = self.path_finder.reachable(occupied, apple, tail)
+        if self.profiler is not None:
+            self.profiler.count_search(self.path_finder, safe)
+        occupied[tail] += 1
+        for cell in left:
+            occupied[cell] += 1
+        for cell in path:
+            occupied[cell] -= 1
+        return [(cell // rows, cell % rows) for cell in path], safe
+
+    def timed_path_to_tail(self):
+        # The stamps assume the tail moves on every step, which stops being
+        # true once the snake eats, so the apple is out of bounds here
+        rows = self.board.rows
+        stamps = self.stamps
+        finder = self.board.path_finder('python')
+        tail = self.body[-1]
+        head = self.head.pos[0] * rows + self.head.pos[1]
+        apple = self.apple.pos[0] * rows + self.apple.pos[1]
+        saved = stamps[apple]
+        stamps[apple] = math.inf
+        path = finder.search_timed(stamps, head, tail, stamps[tail])
+        stamps[apple] = saved
+        if self.profiler is not None:
+            self.profiler.count_search(finder, path)
+        # The snake cannot turn back into its neck, whatever the stamps say
+        if path and path[0] == self.body[1]:
+            return []
+        return [(cell // rows, cell % rows) for cell in path]
+
+    def lookahead(self):
+        if self.profiler is not None:
+            self.profiler.count_lookahead()
+        return VirtualSnake(self)
+
     def get_path_to_tail(self):
-        tail_pos = deepcopy(self.squares[-1].pos)
-        self.squares.pop(-1)
-        path = self.bfs(tuple(self.head.pos), tuple(tail_pos))
-        self.add_square()
+        if self.timed_search:
+            # Without a timed path the tail may still be reachable the
+            # static way, through cells that are free right now
+            path = self.timed_path_to_tail()
+            if path:
+                return path
+        rows = self.board.rows
+        tail = self.body[-1]
+        self.occupied[tail] -= 1
+        path = self.bfs(self.head.pos, (tail // rows, tail % rows))
+        self.occupied[tail] += 1
         return path
 
     def get_available_neighbors(self, pos):
         valid_neighbors = []
-        neighbors = get_neighbors(tuple(pos))
+        neighbors = self.board.get_neighbors(pos)
         for n in neighbors:
             if self.is_position_free(n) and self.apple.pos != n:
-                valid_neighbors.append(tuple(n))
+                valid_neighbors.append(n)
         return valid_neighbors
 
     def longest_path_to_tail(self):
@@ -264,16 +416,16 @@ class Snake:
         path = []
         if neighbors:
             dis = -9999
-            for n in neighbors:
-                if distance(n, self.squares[-1].pos) > dis:
-                    v_snake = self.create_virtual_snake()
-                    v_snake.go_to(n)
-                    v_snake.move()
-                    if v_snake.eating_apple():
-                        v_snake.add_square()
-                    if v_snake.get_path_to_tail():
-                        path.append(n)
-                        dis = distance(n, self.squares[-1].pos)
+            rows = self.board.rows
+            tail = (self.body[-1] // rows, self.body[-1] % rows)
+            with self.lookahead() as v_snake:
+                for n in neighbors:
+                    if distance(n, tail) > dis:
+                        v_snake.move(n)
+                        if v_snake.reaches_tail():
+                            path.append(n)
+                            dis = distance(n, tail)
+                        v_snake.undo()
             if path:
                 return [path[-1]]
 
@@ -281,76 +433,200 @@ class Snake:
         neighbors = self.get_available_neighbors(self.head.pos)
         path = []
         if neighbors:
-            path.append(neighbors[randrange(len(neighbors))])
-            v_snake = self.create_virtual_snake()
-            for move in path:
-                v_snake.go_to(move)
-                v_snake.move()
-            if v_snake.get_path_to_tail():
+            path.append(neighbors[self.rng.randrange(len(neighbors))])
+            with self.lookahead() as v_snake:
+                for move in path:
+                    v_snake.move(move)
+                safe = v_snake.reaches_tail()
+            if safe:
                 return path
             else:
                 return self.get_path_to_tail()
 
     def set_path(self):
-        if self.score == SNAKE_MAX_LENGTH - 1 and self.apple.pos in get_neighbors(self.head.pos):
-            winning_path = [tuple(self.apple.pos)]
+        self.plan_apple = None
+        profiler = self.profiler
+        if profiler is not None:
+            start = perf_counter()
+
+        if self.score == self.board.snake_max_length - 1 and self.apple.pos in self.board.get_neighbors(self.head.pos):
+            winning_path = [self.apple.pos]
+            self.plan_branch = 'winning'
             return winning_path
 
-        v_snake = self.create_virtual_snake()
-        path_1 = v_snake.bfs(tuple(v_snake.head.pos), tuple(v_snake.apple.pos))
-        path_2 = []
-
-        if path_1:
-            for pos in path_1:
-                v_snake.go_to(pos)
-                v_snake.move()
-            v_snake.add_square()
-            path_2 = v_snake.get_path_to_tail()
+        # A timed path that fails its check still leaves the plain one to try
+        path_1, path_2 = [], False
+        if self.timed_search:
+            path_1, path_2 = self.timed_apple_path()
+        if not path_2:
+            path_1 = self.bfs(self.head.pos, self.apple.pos, self.apple_path_finder)
+        if profiler is not None:
+            start = profiler.lap('apple_bfs', start)
+
+        if path_1 and not path_2:
+            with self.lookahead() as v_snake:
+                for pos in path_1:
+                    v_snake.move(pos)
+                v_snake.grow()
+                path_2 = v_snake.reaches_tail()
+            if profiler is not None:
+                start = profiler.lap('tail_check', start)
 
         if path_2:
+            self.plan_apple = self.apple.pos
+            self.plan_branch = 'apple'
             return path_1
 
-        if self.longest_path_to_tail() and\
-                self.score % 2 == 0 and\
-                self.moves_without_eating < MAX_MOVES_WITHOUT_EATING / 2:
-            return self.longest_path_to_tail()
-
-        if self.any_safe_move():
-            return self.any_safe_move()
+        # Each fallback is computed at most once per tick, cheapest checks first
+        if self.score % 2 == 0 and self.moves_without_eating < self.board.max_moves_without_eating / 2:
+            path = self.longest_path_to_tail()
+            if profiler is not None:
+                start = profiler.lap('longest_path', start)
+            if path:
+                self.plan_branch = 'longest_path'
+                return path
 
-        if self.get_path_to_tail():
-            return self.get_path_to_tail()
+        path = self.any_safe_move()
+        if profiler is not None:
+            start = profiler.lap('any_safe_move', start)
+        if path:
+            self.plan_branch = 'any_safe_move'
+            return path
+
+        path = self.get_path_to_tail()
+        if profiler is not None:
+            profiler.lap('path_to_tail', start)
+        self.plan_branch = 'path_to_tail' if path else 'none'
+        return path or None
+
+    def plan_is_valid(self):
+        if not self.reuse_plan or not self.path or self.plan_apple != self.apple.pos:
+            return False
+        next_pos = self.path[0]
+        return distance(next_pos, self.head.pos) == 1 and self.is_position_free(next_pos)
+
+    def plan_hit_rate(self):
+        total = self.plan_stats['replans'] + self.plan_stats['reused']
+        return self.plan_stats['reused'] / total if total else 0
+
+    def step(self):
+        if self.is_ai:
+            if self.profiler is not None:
+                self.profiler.begin_tick(self.total_moves)
+            if self.plan_is_valid():
+                self.plan_stats['reused'] += 1
+                self.plan_branch = 'reused'
+            else:
+                self.path = self.planner.plan(self)
+                self.plan_stats['replans'] += 1
+            if self.profiler is not None:
+                self.profiler.end_tick(self.plan_branch)
+            if self.path:
+                self.go_to(self.path[0])
+                self.path.pop(0)
+
+        self.move()
+        self.total_moves += 1
+
+        if self.score == self.board.snake_max_length:
+            self.won_game = True
+            return 'win'
+
+        if self.hitting_self() or self.head.hitting_wall():
+            self.is_dead = True
+            return 'dead'
+
+        if self.moves_without_eating > self.board.max_moves_without_eating:
+            self.is_dead = True
+            return 'timeout'
+
+        # The new apple is drawn once the tail has grown back, so it never
+        # lands on the cell the tail is about to take
+        if self.eating_apple():
+            self.add_square()
+            self.generate_apple()
 
-        return None
+        return 'playing'
 
     def update(self, events):
         self.handle_events(events)
-        self.draw()
 
         current_time = time.time()
         if current_time - self.last_move_time >= self.move_delay:
-            if self.is_ai:
-                self.path = self.set_path()
-                if self.path:
-                    self.go_to(self.path[0])
-
-            self.move()
             self.last_move_time = current_time
-            self.total_moves += 1
-
-            if self.score == SNAKE_MAX_LENGTH:
-                self.won_game = True
-                return 'win'
-
-            if self.hitting_self() or self.head.hitting_wall():
-                self.is_dead = True
-                return 'dead'
-
-            if self.moves_without_eating > MAX_MOVES_WITHOUT_EATING:
-                self.is_dead = True
-                return 'timeout'
-
-            if self.eating_apple():
-                self.add_square()
-
-        return 'playing'
\ No newline at end of file
+            return self.step()
+
+        return 'playing'
+
+class VirtualSnake:
+    # Simulates moves of a snake in place: moves are applied to the real
+    # snake's occupancy grid and logged so they can be undone, which costs
+    # O(moves simulated) instead of copying the whole body. The real body is
+    # never touched; the virtual body is the real body from the tail end
+    # followed by the simulated head cells.
+    def __init__(self, snake):
+        self.snake = snake
+        self.occupied = snake.occupied
+        self.rows = snake.board.rows
+        self.heads = [snake.head.pos[0] * self.rows + snake.head.pos[1]]
+        self.tail_index = 0
+        self.log = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.rollback()
+
+    def cell_at(self, index):
+        body = self.snake.body
+        if index < len(body):
+            return body[-1 - index]
+        return self.heads[index - len(body) + 1]
+
+    def head_cell(self):
+        return self.heads[-1]
+
+    def tail_cell(self):
+        return self.cell_at(self.tail_index)
+
+    def move(self, position, grow=False):
+        cell = position[0] * self.rows + position[1]
+        self.heads.append(cell)
+        self.occupied[cell] += 1
+        if not grow:
+            self.occupied[self.tail_cell()] -= 1
+            self.tail_index += 1
+        self.log.append(grow)
+
+    def grow(self):
+        # Like Snake.add_square: the tail gets back the cell it just left
+        self.tail_index -= 1
+        self.occupied[self.tail_cell()] += 1
+        self.log.append(None)
+
+    def undo(self):
+        grow = self.log.pop()
+        if grow is None:
+            self.occupied[self.tail_cell()] -= 1
+            self.tail_index += 1
+            return
+        if not grow:
+            self.tail_index -= 1
+            self.occupied[self.tail_cell()] += 1
+        self.occupied[self.heads.pop()] -= 1
+
+    def rollback(self):
+        while self.log:
+            self.undo()
+
+    def reaches_tail(self):
+        # The lookahead only asks whether the tail can be reached, so the
+        # search can skip building the path
+        tail = self.tail_cell()
+        self.occupied[tail] -= 1
+        found = self.snake.path_finder.reachable(self.occupied, self.head_cell(), tail)
+        self.occupied[tail] += 1
+        if self.snake.profiler is not None:
+            self.snake.profiler.count_search(self.snake.path_finder, found)
+        return found
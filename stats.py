@@ -0,0 +1,299 @@
+import json
+import math
+import os
+import time
+from collections import deque
+
+class RunningStats:
+    # Count, mean, variance (Welford), min, max and an optional rolling
+    # window, all updated in O(1) per value with constant memory
+    def __init__(self, window=None):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.recent = deque(maxlen=window) if window else None
+        self.recent_total = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.recent is not None:
+            if len(self.recent) == self.recent.maxlen:
+                self.recent_total -= self.recent[0]
+            self.recent.append(value)
+            self.recent_total += value
+
+    def merge(self, other):
+        # Combine with stats collected elsewhere (Chan et al. parallel update).
+        # The rolling window only follows add(), merged values do not enter it.
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def recent_mean(self):
+        if self.recent:
+            return self.recent_total / len(self.recent)
+        return self.mean
+
+class Histogram:
+    # Fixed-width bins of integer values; values past the last bin are
+    # counted in it. A percentile is the middle integer of its bin, so with
+    # width 1 it is exact
+    def __init__(self, width=1, bins=1024):
+        self.width = width
+        self.counts = [0] * bins
+        self.count = 0
+
+    def add(self, value):
+        index = min(int(value // self.width), len(self.counts) - 1)
+        self.counts[max(index, 0)] += 1
+        self.count += 1
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return index * self.width + (self.width - 1) / 2
+        return (len(self.counts) - 1) * self.width + (self.width - 1) / 2
+
+class StatsStore:
+    # Append-only JSON Lines log of every recorded game plus a small summary
+    # file with the all-time totals and how much of the log they cover.
+    # Games are buffered and written in batches without fsync; on startup the
+    # summary is loaded and only log rows written after it are replayed.
+    def __init__(self, path, flush_every=50, flush_interval=5.0):
+        self.path = path
+        self.summary_path = path + '.summary'
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def load(self):
+        # Returns the saved totals (or None) and the log rows not in them
+        totals, offset = None, 0
+        if os.path.exists(self.summary_path):
+            with open(self.summary_path) as f:
+                summary = json.load(f)
+            totals, offset = summary['all_time_stats'], summary['offset']
+
+        records = []
+        if os.path.exists(self.path) and os.path.getsize(self.path) > offset:
+            with open(self.path, 'rb+') as f:
+                f.seek(offset)
+                lines = f.read().split(b'\n')
+                for line in lines[:-1]:
+                    record = self.parse(line)
+                    if record is not None:
+                        records.append(record)
+                # Batches are written without fsync, so a crash can leave the
+                # last row cut short. It is dropped from the file, or finished
+                # if only its newline is missing, so the next batch starts on
+                # a line of its own.
+                if lines[-1].strip():
+                    record = self.parse(lines[-1])
+                    if record is None:
+                        f.truncate(f.tell() - len(lines[-1]))
+                    else:
+                        records.append(record)
+                        f.write(b'\n')
+        return totals, records
+
+    def parse(self, line):
+        # A log row as a dict, or None for a blank or unreadable row
+        if not line.strip():
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def append(self, record, all_time_stats):
+        self.buffer.append(json.dumps(record))
+        if len(self.buffer) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush(all_time_stats)
+
+    def flush(self, all_time_stats):
+        self.last_flush = time.monotonic()
+        if self.buffer:
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        # The summary is replaced in one step, so a crash leaves the old one
+        # and the rows after its offset are replayed on the next start
+        offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        temp_path = self.summary_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'offset': offset, 'all_time_stats': all_time_stats}, f)
+        os.replace(temp_path, self.summary_path)
+
+    def clear(self):
+        self.buffer = []
+        for path in (self.path, self.summary_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class GameStats:
+    def __init__(self, store=None):
+        self.store = store
+        self.analysis = None
+        self.reset_session_stats()
+        self.all_time_stats = {
+            'ai_games': 0,
+            'ai_wins': 0,
+            'ai_total_score': 0,
+            'ai_best_score': 0,
+            'ai_total_time': 0,
+            'ai_total_moves': 0,
+            'ai_apple_moves': 0,
+            'manual_games': 0,
+            'manual_wins': 0,
+            'manual_total_score': 0,
+            'manual_best_score': 0,
+            'manual_total_time': 0,
+            'manual_total_moves': 0,
+            'manual_apple_moves': 0
+        }
+
+        if self.store is not None:
+            totals, records = self.store.load()
+            if totals is not None:
+                self.all_time_stats.update(totals)
+            for record in records:
+                self.add_to_all_time(record)
+    
+    def reset_session_stats(self):
+        self.session_stats = {
+            'ai_games': 0,
+            'ai_wins': 0,
+            'ai_scores': RunningStats(window=100),
+            'ai_score_histogram': Histogram(width=1, bins=16384),
+            'ai_moves_per_apple': RunningStats(),
+            'manual_games': 0,
+            'manual_wins': 0,
+            'manual_scores': RunningStats(window=100),
+            'manual_score_histogram': Histogram(width=1, bins=16384),
+            'manual_moves_per_apple': RunningStats()
+        }
+        self.analysis = None
+    
+    def record_game(self, mode, score, won, game_time, moves=0, moves_per_apple=None):
+        self.session_stats[f'{mode}_games'] += 1
+        self.session_stats[f'{mode}_scores'].add(score)
+        self.session_stats[f'{mode}_score_histogram'].add(score)
+        if moves_per_apple:
+            self.session_stats[f'{mode}_moves_per_apple'].merge(moves_per_apple)
+        if won:
+            self.session_stats[f'{mode}_wins'] += 1
+        
+        record = {
+            'mode': mode,
+            'score': score,
+            'won': bool(won),
+            'time': game_time,
+            'moves': moves,
+            'apple_moves': moves_per_apple.total if moves_per_apple else 0,
+            'at': time.time()
+        }
+        self.add_to_all_time(record)
+        if self.store is not None:
+            self.store.append(record, self.all_time_stats)
+
+    def add_to_all_time(self, record):
+        self.analysis = None
+        mode = record['mode']
+        self.all_time_stats[f'{mode}_games'] += 1
+        self.all_time_stats[f'{mode}_total_score'] += record['score']
+        self.all_time_stats[f'{mode}_total_time'] += record['time']
+        self.all_time_stats[f'{mode}_total_moves'] += record['moves']
+        self.all_time_stats[f'{mode}_apple_moves'] += record['apple_moves']
+        if record['score'] > self.all_time_stats[f'{mode}_best_score']:
+            self.all_time_stats[f'{mode}_best_score'] = record['score']
+        if record['won']:
+            self.all_time_stats[f'{mode}_wins'] += 1
+
+    def flush(self):
+        if self.store is not None:
+            self.store.flush(self.all_time_stats)
+
+    def clear_history(self):
+        if self.store is not None:
+            self.store.clear()
+    
+    def get_analysis(self):
+        # Cached until the next recorded game, so drawing it every frame is free
+        if self.analysis is not None:
+            return self.analysis
+        analysis = {}
+        
+        for mode in ['ai', 'manual']:
+            games = self.all_time_stats[f'{mode}_games']
+            if games > 0:
+                wins = self.all_time_stats[f'{mode}_wins']
+                total_score = self.all_time_stats[f'{mode}_total_score']
+                total_time = self.all_time_stats[f'{mode}_total_time']
+                total_moves = self.all_time_stats[f'{mode}_total_moves']
+                apple_moves = self.all_time_stats[f'{mode}_apple_moves']
+                
+                analysis[mode] = {
+                    'win_rate': (wins / games) * 100,
+                    'avg_score': total_score / games,
+                    'avg_time': total_time / games,
+                    'avg_moves': total_moves / games,
+                    'moves_per_apple': apple_moves / total_score if total_score else 0,
+                    'best_score': self.all_time_stats[f'{mode}_best_score'],
+                    'total_games': games
+                }
+            else:
+                analysis[mode] = {
+                    'win_rate': 0,
+                    'avg_score': 0,
+                    'avg_time': 0,
+                    'avg_moves': 0,
+                    'moves_per_apple': 0,
+                    'best_score': 0,
+                    'total_games': 0
+                }
+
+            scores = self.session_stats[f'{mode}_scores']
+            histogram = self.session_stats[f'{mode}_score_histogram']
+            analysis[mode].update({
+                'session_score_std': scores.std(),
+                'session_score_median': histogram.percentile(50),
+                'session_score_p90': histogram.percentile(90),
+                'recent_avg_score': scores.recent_mean(),
+                'session_moves_per_apple_std': self.session_stats[f'{mode}_moves_per_apple'].std()
+            })
+        
+        self.analysis = analysis
+        return analysis
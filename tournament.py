@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from headless import play_game
+from stats import GameStats, StatsStore
+from setting import ROWS
+from board import MIN_ROWS
+from planners import PLANNERS, planner_error
+
+def run_game(job):
+    seed, backend, rows, planner = job
+    return play_game(seed, backend, rows, planner=planner)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many seeded AI games on all cores")
+    parser.add_argument('--games', type=int, default=1000, help="number of games to play")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, game i uses seed + i")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--chunksize', type=int, default=4, help="games handed to a worker at a time")
+    parser.add_argument('--rows', type=int, default=ROWS, help="board size")
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python',
+                        help="search backend used by the AI; numpy is slower than python "
+                             "below about 128 rows")
+    parser.add_argument('--planner', choices=PLANNERS, default='bfs',
+                        help="AI strategy; timed plans about three times slower than bfs and times out "
+                             "more often on small boards, "
+                             "hamiltonian needs an even number of rows")
+    parser.add_argument('--store', metavar='FILE', help="also append every game to this stats store")
+    parser.add_argument('--progress', type=int, default=100, help="print progress every N games, 0 to disable")
+    args = parser.parse_args(argv)
+    if args.rows < MIN_ROWS:
+        parser.error(f"the board needs at least {MIN_ROWS} rows, got {args.rows}")
+    error = planner_error(args.planner, args.rows)
+    if error:
+        parser.error(error)
+
+    stats = GameStats()
+    history = GameStats(StatsStore(args.store)) if args.store else None
+    total_moves = 0
+    start = time.perf_counter()
+    jobs = ((args.seed + i, args.backend, args.rows, args.planner) for i in range(args.games))
+
+    with Pool(args.workers) as pool:
+        # Results come back as games finish, so the parent aggregates while
+        # the workers keep playing
+        for done, game in enumerate(pool.imap_unordered(run_game, jobs, args.chunksize), 1):
+            stats.record_game('ai', game['score'], game['won'], game['wall_time'],
+                              game['moves'], game['moves_per_apple'])
+            total_moves += game['moves']
+            if history is not None:
+                history.record_game('ai', game['score'], game['won'], game['wall_time'],
+                                    game['moves'], game['moves_per_apple'])
+            if args.progress and done % args.progress == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{args.games} games  {done / elapsed:.1f} games/s")
+
+    elapsed = time.perf_counter() - start
+    if history is not None:
+        history.flush()
+        print(f"All-time AI games in {args.store}: {history.all_time_stats['ai_games']}")
+    ai = stats.get_analysis()['ai']
+    print(f"Games: {ai['total_games']}  Workers: {args.workers}")
+    print(f"Win rate: {ai['win_rate']:.2f}%  Average score: {ai['avg_score']:.1f}  Best score: {ai['best_score']}")
+    print(f"Average moves: {ai['avg_moves']:.1f}  Moves/apple: {ai['moves_per_apple']:.2f}  "
+          f"Average game time: {ai['avg_time']:.2f}s")
+    print(f"Elapsed: {elapsed:.2f}s  ({ai['total_games'] / max(elapsed, 1e-9):.2f} games/s, "
+          f"{total_moves / max(elapsed, 1e-9):.0f} moves/s)")
+
+if __name__ == '__main__':
+    main()